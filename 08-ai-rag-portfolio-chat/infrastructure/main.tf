@@ -6,9 +6,10 @@ module "s3" {
 }
 
 module "iam" {
-  source     = "./modules/iam"
-  bucket_arn = module.s3.bucket_arn
-  tags       = var.tags
+  source            = "./modules/iam"
+  bucket_arn        = module.s3.bucket_arn
+  vector_bucket_arn = "arn:aws:s3:::${var.vector_bucket_name}"
+  tags              = var.tags
 }
 
 
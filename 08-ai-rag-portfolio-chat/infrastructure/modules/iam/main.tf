@@ -30,6 +30,21 @@ resource "aws_iam_policy" "lambda_policy" {
         Action   = ["s3:ListBucket"],
         Resource = var.bucket_arn
       },
+      {
+        Effect = "Allow",
+        Action = [
+          "s3:GetObject",
+          "s3:PutObject",
+          "s3:AbortMultipartUpload"
+        ],
+        Resource = "${var.vector_bucket_arn}/*"
+      },
+      {
+        # Also makes HEAD on a missing index return 404 instead of 403
+        Effect   = "Allow",
+        Action   = ["s3:ListBucket"],
+        Resource = var.vector_bucket_arn
+      },
       {
         Effect   = "Allow",
         Action   = ["logs:CreateLogGroup", "logs:CreateLogStream", "logs:PutLogEvents"],
@@ -4,6 +4,10 @@ variable "bucket_arn" {
 
 }
 
+variable "vector_bucket_arn" {
+  type        = string
+  description = "ARN of the S3 bucket holding the vector indexes"
+}
 
 variable "tags" {
   type        = map(string)
@@ -9,6 +9,7 @@ resource "aws_lambda_function" "ingest" {
     variables = {
       SRC_BUCKET         = var.bucket_name
       EMBED_MODEL        = var.embed_model
+      EMBED_BACKEND      = "bedrock"
       VECTOR_BUCKET_NAME = var.vector_bucket_name
     }
   }
@@ -0,0 +1,130 @@
+import codecs
+import os
+import re
+
+# Streaming, structure-aware chunking:
+#   iter_decoded  S3 body -> text, READ_WINDOW bytes at a time
+#   iter_blocks   text -> ("heading", line) / ("text", paragraph) blocks
+#   iter_chunks   blocks -> chunks of at most CHUNK_SIZE characters
+# Chunks never span two Markdown sections and repeat the section heading;
+# oversized paragraphs are split on sentences, then on words. Consecutive
+# chunks of a section share up to CHUNK_OVERLAP characters.
+
+CHUNK_SIZE = int(os.environ.get("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.environ.get("CHUNK_OVERLAP", "150"))
+READ_WINDOW = 64 * 1024
+
+HEADING_RE = re.compile(r"#{1,6}\s")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def iter_decoded(body, window=READ_WINDOW):
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for raw in body.iter_chunks(window):
+        text = decoder.decode(raw)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_lines(pieces, max_line=4 * CHUNK_SIZE):
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        *lines, buffer = buffer.split("\n")
+        yield from lines
+        # A file without newlines must not grow the buffer unbounded
+        while len(buffer) > max_line:
+            cut = buffer.rfind(" ", 0, max_line)
+            cut = cut if cut > 0 else max_line
+            yield buffer[:cut]
+            buffer = buffer[cut:].lstrip()
+    if buffer:
+        yield buffer
+
+
+def iter_blocks(pieces, max_paragraph=4 * CHUNK_SIZE):
+    paragraph = []
+    length = 0
+    for line in iter_lines(pieces):
+        stripped = line.strip()
+        if HEADING_RE.match(stripped) or not stripped or length > max_paragraph:
+            if paragraph:
+                yield "text", "\n".join(paragraph)
+                paragraph, length = [], 0
+        if HEADING_RE.match(stripped):
+            yield "heading", stripped
+        elif stripped:
+            paragraph.append(stripped)
+            length += len(stripped) + 1
+    if paragraph:
+        yield "text", "\n".join(paragraph)
+
+
+def _split_long(text, size):
+    pieces = []
+    for sentence in SENTENCE_RE.split(text):
+        while len(sentence) > size:
+            cut = sentence.rfind(" ", 0, size)
+            cut = cut if cut > 0 else size
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            pieces.append(sentence)
+    return pieces
+
+
+def _tail(text, overlap):
+    if overlap <= 0:
+        return ""
+    if len(text) <= overlap:
+        return text
+    # Prefer starting the overlap on a sentence, then on a word
+    window = text[-overlap:]
+    sentence = SENTENCE_RE.search(window)
+    if sentence and sentence.end() < len(window):
+        return window[sentence.end() :]
+    start = window.find(" ")
+    return window[start + 1 :] if start != -1 else window
+
+
+def iter_chunks(blocks, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    heading, body, has_content = "", "", False
+
+    def render():
+        return f"{heading}\n\n{body}" if heading else body
+
+    for kind, text in blocks:
+        if kind == "heading":
+            if has_content:
+                yield render()
+            if has_content or body:
+                heading = ""
+            # Consecutive headings (no text in between) are kept together
+            heading = f"{heading}\n{text}" if heading else text
+            heading = heading[: size // 4]
+            body, has_content = "", False
+            continue
+
+        budget = size - (len(heading) + 2 if heading else 0)
+        pieces = [text] if len(text) <= budget else _split_long(text, budget)
+        for i, piece in enumerate(pieces):
+            separator = "\n\n" if i == 0 else " "
+            if body and len(body) + len(separator) + len(piece) > budget:
+                if has_content:
+                    yield render()
+                    body, has_content = _tail(body, overlap), False
+                if body and len(body) + len(separator) + len(piece) > budget:
+                    body = ""
+            body = f"{body}{separator}{piece}" if body else piece
+            has_content = True
+
+    if has_content:
+        yield render()
+
+
+def chunk_s3_body(body, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """Generator of chunks for a streaming S3 body; memory is O(chunk size)."""
+    return iter_chunks(iter_blocks(iter_decoded(body)), size, overlap)
@@ -0,0 +1,147 @@
+import json
+import logging
+import math
+import os
+import re
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import boto3
+import numpy as np
+from botocore.config import Config
+
+logger = logging.getLogger()
+
+# Embedding backends. Every backend returns a (len(texts), dim) float32 matrix
+# of L2-normalised rows, so indexes can be searched with a plain dot product.
+#   hashing  offline feature-hashed unigrams + bigrams with log-scaled tf
+#   bedrock  Amazon Titan text embeddings via bedrock-runtime
+EMBED_BACKEND = os.environ.get("EMBED_BACKEND", "hashing")
+EMBED_MODEL = os.environ.get("EMBED_MODEL", "amazon.titan-embed-text-v2:0")
+EMBED_DIM = int(os.environ.get("EMBED_DIM", "512"))
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "32"))
+EMBED_CONCURRENCY = int(os.environ.get("EMBED_CONCURRENCY", "8"))
+BEDROCK_REGION = os.environ.get("BEDROCK_REGION", "us-east-1")
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class EmbeddingBackend:
+    """Interface: `name`, `dim` and `embed(texts) -> float32 matrix`."""
+
+    name = "base"
+    dim = 0
+
+    def embed(self, texts):
+        raise NotImplementedError
+
+
+class HashingEmbedder(EmbeddingBackend):
+    """Signed feature hashing, deterministic across processes (crc32)."""
+
+    name = "hashing"
+
+    def __init__(self, dim=EMBED_DIM):
+        self.dim = dim
+
+    def _features(self, text):
+        tokens = TOKEN_RE.findall(text.lower())
+        bigrams = [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return Counter(tokens + bigrams)
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if not features:
+                continue
+            hashes = np.fromiter(
+                (zlib.crc32(term.encode("utf-8")) for term in features),
+                dtype=np.uint32,
+                count=len(features),
+            )
+            weights = np.fromiter(
+                (1.0 + math.log(tf) for tf in features.values()),
+                dtype=np.float32,
+                count=len(features),
+            )
+            signs = np.where(hashes >> 31, 1.0, -1.0).astype(np.float32)
+            np.add.at(matrix[row], hashes % self.dim, signs * weights)
+        return normalize(matrix)
+
+
+class BedrockEmbedder(EmbeddingBackend):
+    """Titan embeddings; one request per text, a batch fans out on threads.
+
+    Every batch shares one executor, so concurrent records never have more
+    than EMBED_CONCURRENCY requests in flight, matching the connection pool.
+    """
+
+    name = "bedrock"
+
+    def __init__(self, model_id=EMBED_MODEL, dim=EMBED_DIM):
+        self.model_id = model_id
+        # Titan v2 supports 256/512/1024 dimensions, v1 is fixed at 1536
+        self.dim = dim if "v2" in model_id else 1536
+        self.client = boto3.client(
+            "bedrock-runtime",
+            region_name=BEDROCK_REGION,
+            config=Config(
+                max_pool_connections=EMBED_CONCURRENCY,
+                retries={"max_attempts": 8, "mode": "adaptive"},
+            ),
+        )
+        self.pool = ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY)
+
+    def _embed_one(self, text):
+        body = {"inputText": text}
+        if "v2" in self.model_id:
+            body.update({"dimensions": self.dim, "normalize": True})
+        response = self.client.invoke_model(
+            modelId=self.model_id,
+            body=json.dumps(body),
+            contentType="application/json",
+            accept="application/json",
+        )
+        return json.loads(response["body"].read())["embedding"]
+
+    def embed(self, texts):
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return normalize(list(self.pool.map(self._embed_one, texts)))
+
+
+BACKENDS = {"hashing": HashingEmbedder, "bedrock": BedrockEmbedder}
+
+
+@lru_cache(maxsize=None)
+def get_embedder(name=EMBED_BACKEND):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown EMBED_BACKEND {name!r}; use {sorted(BACKENDS)}")
+    embedder = BACKENDS[name]()
+    logger.info(f"Embedding backend: {embedder.name} ({embedder.dim} dims)")
+    return embedder
+
+
+def embed_chunks(embedder, chunks, batch_size=EMBED_BATCH_SIZE):
+    """Embed `chunks` in batches into one (n, dim) float32 matrix."""
+    batches = []
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            batches.append(embedder.embed(batch))
+            batch = []
+    if batch:
+        batches.append(embedder.embed(batch))
+    if not batches:
+        return np.zeros((0, embedder.dim), dtype=np.float32)
+    return np.concatenate(batches)
@@ -3,48 +3,101 @@ import os
 import json
 import logging
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import unquote_plus
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+from chunker import chunk_s3_body
+from embeddings import embed_chunks, get_embedder
+from search import DEFAULT_TOP_K, IndexCatalog
+from utils.router import route_request
+from vector_store import INDEX_SUFFIX, upload_index
+
 # Setup logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Set up S3 clients per region
-s3_client_docs = boto3.client("s3", region_name="ap-south-1")
-s3_client_vector = boto3.client("s3", region_name="us-east-1")
-
 # Constants
-SOURCE_BUCKET = os.environ.get("SOURCE_BUCKET")  # ap-south-1
-VECTOR_BUCKET = os.environ.get("VECTOR_BUCKET")  # us-east-1
+SOURCE_BUCKET = os.environ.get("SOURCE_BUCKET") or os.environ.get("SRC_BUCKET")
+VECTOR_BUCKET = os.environ.get("VECTOR_BUCKET") or os.environ.get("VECTOR_BUCKET_NAME")
 VECTOR_INDEX_PREFIX = "vector-indexes/"
+RECORD_CONCURRENCY = int(os.environ.get("RECORD_CONCURRENCY", "8"))
+SOURCE_ETAG_KEY = "source-etag"
+
+# Set up S3 clients per region; shared by all record threads, so the
+# connection pools are sized for them and reused across warm invocations
+S3_CONFIG = Config(
+    max_pool_connections=RECORD_CONCURRENCY * 2,
+    tcp_keepalive=True,
+    retries={"max_attempts": 5, "mode": "adaptive"},
+)
+s3_client_docs = boto3.client("s3", region_name="ap-south-1", config=S3_CONFIG)
+s3_client_vector = boto3.client("s3", region_name="us-east-1", config=S3_CONFIG)
+
+# Search catalog, kept across warm invocations
+_catalog = None
 
 
-def dummy_embed_text(text):
-    """Fake embedding function — replace with your real embedding model"""
-    return [ord(c) for c in text[:50]]  # Simple list of char codes
+def _remember(items, into):
+    for item in items:
+        into.append(item)
+        yield item
 
 
-def save_vector_index(chunks, file_name):
+def index_key(object_key):
+    return f"{VECTOR_INDEX_PREFIX}{object_key.replace('/', '_')}{INDEX_SUFFIX}"
+
+
+def index_is_current(object_key, etag):
+    """True when the index was built from this exact source object (ETag)."""
     try:
-        logger.info(f"Saving vector index for file: {file_name}")
-        index_data = {
-            "file": file_name,
-            "vectors": [dummy_embed_text(chunk) for chunk in chunks],
-        }
+        head = s3_client_vector.head_object(
+            Bucket=VECTOR_BUCKET, Key=index_key(object_key)
+        )
+    except ClientError as e:
+        code = e.response["Error"]["Code"]
+        if code in ("404", "NoSuchKey", "NotFound"):
+            return False
+        if code in ("403", "AccessDenied", "Forbidden"):
+            # Without s3:ListBucket a missing key is reported as 403; rebuild
+            logger.warning(f"HEAD on vector index for {object_key} denied: {code}")
+            return False
+        raise
+    return head.get("Metadata", {}).get(SOURCE_ETAG_KEY) == etag.strip('"')
+
 
-        key = f"{VECTOR_INDEX_PREFIX}{file_name}.json"
-        local_path = f"/tmp/{file_name}_vector.json"
+def save_vector_index(chunks, file_name, source_etag=None):
+    try:
+        logger.info(f"Saving vector index for file: {file_name}")
+        embedder = get_embedder()
+        # `chunks` may be a generator; keep the texts for the index as they pass
+        texts = []
+        vectors = embed_chunks(embedder, _remember(chunks, texts))
 
-        with open(local_path, "w") as f:
-            json.dump(index_data, f)
+        key = index_key(file_name)
 
         logger.info(f"Uploading to vector bucket: {VECTOR_BUCKET}, Key: {key}")
         if not VECTOR_BUCKET or not key:
             raise ValueError("VECTOR_BUCKET or key is None!")
 
-        s3_client_vector.upload_file(local_path, VECTOR_BUCKET, key)
-        logger.info("Upload completed successfully.")
+        # Streamed straight into a (multipart) upload, no /tmp copy
+        size = upload_index(
+            s3_client_vector,
+            VECTOR_BUCKET,
+            key,
+            vectors,
+            texts,
+            metadata={
+                "file": file_name,
+                "backend": embedder.name,
+                "dim": embedder.dim,
+                "source_etag": source_etag,
+            },
+            # Manifest for skipping unchanged sources, readable with a HEAD
+            object_metadata={SOURCE_ETAG_KEY: source_etag} if source_etag else None,
+        )
+        logger.info(f"Upload completed successfully ({size} bytes).")
 
     except Exception as e:
         logger.error(f"Failed to save vector index: {str(e)}", exc_info=True)
@@ -55,27 +108,87 @@ def process_s3_file(bucket_name, object_key):
     try:
         logger.info(f"Downloading file: {object_key} from {bucket_name}")
         response = s3_client_docs.get_object(Bucket=bucket_name, Key=object_key)
-        content = response["Body"].read().decode("utf-8")
 
-        chunks = content.split("\n\n")  # Dummy chunking
-        save_vector_index(chunks, object_key.replace("/", "_"))
+        # Chunks stream from the S3 body straight into the embedder
+        chunks = chunk_s3_body(response["Body"])
+        save_vector_index(
+            chunks, object_key, source_etag=response["ETag"].strip('"')
+        )
 
     except Exception as e:
         logger.error(f"Error processing file: {e}", exc_info=True)
         raise
 
 
+def get_catalog():
+    global _catalog
+    if _catalog is None:
+        _catalog = IndexCatalog(
+            s3_client_vector, VECTOR_BUCKET, VECTOR_INDEX_PREFIX, get_embedder()
+        )
+    return _catalog
+
+
+def search_handler(event):
+    params = event.get("queryStringParameters") or {}
+    body = json.loads(event.get("body") or "{}") if "body" in event else event
+    query = body.get("query") or params.get("q")
+    if not query:
+        return {"statusCode": 400, "body": json.dumps("Missing query")}
+
+    k = body.get("k") or params.get("k") or DEFAULT_TOP_K
+    results = get_catalog().search(query, k=int(k))
+    logger.info(f"Search returned {len(results)} results")
+    return {"statusCode": 200, "body": json.dumps({"results": results})}
+
+
+def process_record(record):
+    s3_info = record["s3"]
+    bucket = s3_info["bucket"]["name"]
+    key = unquote_plus(s3_info["object"]["key"])
+    etag = s3_info["object"].get("eTag")
+    logger.info(f"S3 Triggered file: {key}")
+
+    if etag and index_is_current(key, etag):
+        logger.info(f"Index for {key} is up to date, skipping")
+        return {"key": key, "status": "skipped"}
+    process_s3_file(bucket, key)
+    return {"key": key, "status": "indexed"}
+
+
+def process_records(records):
+    results, failures = [], []
+    with ThreadPoolExecutor(max_workers=RECORD_CONCURRENCY) as pool:
+        futures = [(record, pool.submit(process_record, record)) for record in records]
+        for record, future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                key = unquote_plus(record["s3"]["object"]["key"])
+                failures.append({"key": key, "error": str(e)})
+    logger.info(f"Processed {len(records)} records, {len(failures)} failed")
+    return results, failures
+
+
 def lambda_handler(event, context):
     logger.info("Lambda triggered")
     try:
         # Handle S3 trigger event
         if "Records" in event and "s3" in event["Records"][0]:
-            for record in event["Records"]:
-                s3_info = record["s3"]
-                bucket = s3_info["bucket"]["name"]
-                key = unquote_plus(s3_info["object"]["key"])
-                logger.info(f"S3 Triggered file: {key}")
-                process_s3_file(bucket, key)
+            results, failures = process_records(event["Records"])
+            if failures:
+                status = 207 if results else 500
+                body = {"results": results, "failed": failures}
+                return {"statusCode": status, "body": json.dumps(body)}
+            return {"statusCode": 200, "body": json.dumps({"results": results})}
+
+        # Handle function URL requests
+        elif "rawPath" in event:
+            return route_request(event)
+
+        # Handle search over the vector indexes (direct invoke)
+        elif "query" in event:
+            return search_handler(event)
 
         # Handle manual/API trigger
         elif "file_key" in event:
@@ -0,0 +1,139 @@
+import logging
+import os
+import time
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+from vector_store import INDEX_SUFFIX, LEGACY_SUFFIX, load_index
+
+logger = logging.getLogger()
+
+# All indexes under the prefix are held as one float32 matrix per container.
+# A refresh lists the prefix and only downloads keys whose ETag changed; the
+# matrix is re-concatenated locally when the set of indexes changes.
+
+REFRESH_SECONDS = float(os.environ.get("SEARCH_REFRESH_SECONDS", "30"))
+DEFAULT_TOP_K = 5
+MAX_TOP_K = 50
+
+
+def _base_name(key):
+    for suffix in (INDEX_SUFFIX, LEGACY_SUFFIX):
+        if key.endswith(suffix):
+            return key[: -len(suffix)]
+    return None
+
+
+class IndexCatalog:
+    def __init__(self, s3, bucket, prefix, embedder):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.embedder = embedder
+        self.entries = {}  # base name -> {"key", "etag", "index"}
+        self.matrix = np.zeros((0, embedder.dim), dtype=np.float32)
+        self.rows = []  # (base name, row in that index) per matrix row
+        self.refreshed = 0.0
+
+    def _listing(self):
+        # One key per document; the binary index wins over a legacy JSON one
+        listing = {}
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                base = _base_name(obj["Key"])
+                if base is None:
+                    continue
+                if base in listing and not obj["Key"].endswith(INDEX_SUFFIX):
+                    continue
+                listing[base] = (obj["Key"], obj["ETag"])
+        return listing
+
+    def _compatible(self, index):
+        backend = index.metadata.get("backend")
+        if backend and backend != self.embedder.name:
+            return False
+        return len(index) > 0 and index.dim == self.embedder.dim
+
+    def refresh(self, force=False):
+        if not force and time.monotonic() - self.refreshed < REFRESH_SECONDS:
+            return False
+        self.refreshed = time.monotonic()
+
+        listing = self._listing()
+        # Built aside and swapped in with the matrix, so entries and rows
+        # always describe the same indexes even when a key fails to load
+        entries = {}
+        changed = set(self.entries) - set(listing)  # removed indexes
+        for base, (key, etag) in listing.items():
+            entry = self.entries.get(base)
+            if entry and entry["key"] == key and entry["etag"] == etag:
+                entries[base] = entry
+                continue
+            try:
+                data = self.s3.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+            except ClientError as e:
+                # Transient: keep serving the previous version, retry next time
+                logger.warning(f"Could not download index {key}: {e}")
+                if entry:
+                    entries[base] = entry
+                continue
+            try:
+                index = load_index(data, key)
+            except Exception as e:
+                # Not an index (e.g. a stray JSON file); skipped until it changes
+                logger.warning(f"Skipping index {key}: {e!r}")
+                index = None
+            if index is not None and not self._compatible(index):
+                logger.warning(f"Skipping index {key}: incompatible with embedder")
+                index = None
+            entries[base] = {"key": key, "etag": etag, "index": index}
+            changed.add(base)
+
+        if changed:
+            self._rebuild(entries)
+            logger.info(
+                f"Search catalog refreshed: {len(changed)} changed, "
+                f"{len(self.entries)} indexes, {len(self.rows)} chunks"
+            )
+        return bool(changed)
+
+    def _rebuild(self, entries):
+        blocks, rows = [], []
+        for base, entry in sorted(entries.items()):
+            index = entry["index"]
+            if index is None:
+                continue
+            blocks.append(np.asarray(index.vectors, dtype=np.float32))
+            rows.extend((base, row) for row in range(len(index)))
+        if blocks:
+            matrix = np.ascontiguousarray(np.concatenate(blocks))
+        else:
+            matrix = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self.entries, self.matrix, self.rows = entries, matrix, rows
+
+    def search(self, query, k=DEFAULT_TOP_K):
+        self.refresh()
+        if not self.rows:
+            return []
+        k = max(1, min(int(k), MAX_TOP_K, len(self.rows)))
+
+        query_vector = self.embedder.embed([query])[0]
+        scores = self.matrix @ query_vector
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for row in top:
+            base, local_row = self.rows[row]
+            index = self.entries[base]["index"]
+            results.append(
+                {
+                    "file": index.metadata.get("file", base[len(self.prefix) :]),
+                    "chunk": local_row,
+                    "score": float(scores[row]),
+                    "text": index.text(local_row),
+                }
+            )
+        return results
@@ -1,46 +1,90 @@
-import json
+from importlib import import_module
 from typing import Dict, Any
 
-from ..utils.response import error_response
+from utils.response import error_response, success_response
+
+# (method, path) -> "module:function". Static paths dispatch with one dict
+# lookup; paths with {params} are compiled into a segment trie. Targets are
+# imported on first hit, so a route only loads what it needs.
+ROUTES = [
+    ("GET", "/", "utils.router:welcome"),
+    ("GET", "/search", "lambda_function:search_handler"),
+    ("POST", "/search", "lambda_function:search_handler"),
+]
+
+
+class _Node:
+    __slots__ = ("children", "param", "param_name", "targets")
+
+    def __init__(self):
+        self.children = {}
+        self.param = None
+        self.param_name = None
+        self.targets = {}
+
+
+class Router:
+    def __init__(self, routes=()):
+        self.static = {}
+        self.root = _Node()
+        for method, path, target in routes:
+            self.add(method, path, target)
+
+    def add(self, method: str, path: str, target: str) -> None:
+        if "{" not in path:
+            self.static[(method, path)] = target
+            return
+        node = self.root
+        for segment in path.strip("/").split("/"):
+            if segment.startswith("{") and segment.endswith("}"):
+                node.param = node.param or _Node()
+                node.param_name = segment[1:-1]
+                node = node.param
+            else:
+                node = node.children.setdefault(segment, _Node())
+        node.targets[method] = target
+
+    def match(self, method: str, path: str):
+        path = path.rstrip("/") or "/"
+        target = self.static.get((method, path))
+        if target:
+            return target, {}
+
+        node, params = self.root, {}
+        for segment in path.strip("/").split("/"):
+            child = node.children.get(segment)
+            if child is None and node.param is not None and segment:
+                params[node.param_name] = segment
+                child = node.param
+            if child is None:
+                return None, None
+            node = child
+        target = node.targets.get(method)
+        return (target, params) if target else (None, None)
+
+
+router = Router(ROUTES)
+_targets = {}
+
+
+def resolve(target: str):
+    if target not in _targets:
+        module, function = target.split(":")
+        _targets[target] = getattr(import_module(module), function)
+    return _targets[target]
+
+
+def welcome(event: Dict[str, Any]) -> Dict[str, Any]:
+    return success_response({"message": "Welcome to the AI RAG indexer"})
 
 
 def route_request(event: Dict[str, Any]) -> Dict[str, Any]:
     path = event.get("rawPath", "")
     method = event.get("requestContext", {}).get("http", {}).get("method", "GET")
 
-    if path in ["/repos", "/repo"] and method == "GET":
-        return list_repos()
-
-    elif path == "/status" and method == "GET":
-        params = event.get("queryStringParameters") or {}
-        project = params.get("project")
-        return check_project_status(project)
-
-    elif path == "/start" and method == "POST":
-        body = json.loads(event.get("body", "{}"))
-        project = body.get("project")
-        return start_project(project)
-
-    elif path == "/destroy" and method == "POST":
-        body = json.loads(event.get("body", "{}"))
-        project = body.get("project")
-        return destroy_project(project)
-
-    elif path.startswith("/webhook/") and method == "POST":
-        # Extract webhook token from path
-        webhook_token = path.split("/webhook/")[-1]
-        
-        # Route to appropriate project webhook
-        if webhook_token.startswith("tf-p1-"):
-            return webhook_project_01_deploy(webhook_token)
-        else:
-            return error_response("Invalid webhook", 404)
-
-    elif path == "/":
-        return {
-            "statusCode": 200,
-            "body": json.dumps({"message": "Welcome to the AWS Portfolio Controller"}),
-        }
-
-    else:
+    target, params = router.match(method, path)
+    if target is None:
         return error_response("Not found", 404)
+    if params:
+        event["pathParameters"] = {**(event.get("pathParameters") or {}), **params}
+    return resolve(target)(event)
@@ -0,0 +1,227 @@
+import json
+import logging
+import os
+import struct
+
+import numpy as np
+
+logger = logging.getLogger()
+
+# Binary vector index (.vec):
+#   magic b"RAGIDX01" | uint32 header length | JSON header | sections
+# Sections are 64-byte aligned; the header maps name -> [offset, nbytes]:
+#   vectors   (count, dim) float16/float32, rows L2-normalised
+#   offsets   uint64 x (count + 1) byte offsets into `texts`
+#   texts     utf-8 chunk texts, concatenated
+# The legacy JSON indexes ({"file", "vectors"[, "chunks"]}) are still readable.
+
+MAGIC = b"RAGIDX01"
+ALIGN = 64
+INDEX_DTYPE = os.environ.get("INDEX_DTYPE", "float16")
+INDEX_SUFFIX = ".vec"
+LEGACY_SUFFIX = ".json"
+PART_SIZE = 8 * 1024 * 1024  # S3 minimum is 5 MiB for all but the last part
+
+
+def _pad(n):
+    return -n % ALIGN
+
+
+def iter_index_bytes(vectors, chunks, metadata=None, dtype=INDEX_DTYPE):
+    """Yield the serialized index piece by piece, without building it in memory."""
+    vectors = np.ascontiguousarray(vectors, dtype=dtype)
+    if vectors.ndim != 2:
+        vectors = vectors.reshape(len(chunks), -1 if chunks else 0)
+    encoded = [chunk.encode("utf-8") for chunk in chunks]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(text) for text in encoded], dtype=np.uint64)
+
+    sizes = {
+        "vectors": vectors.nbytes,
+        "offsets": offsets.nbytes,
+        "texts": int(offsets[-1]),
+    }
+    header = {
+        "version": 1,
+        "count": len(encoded),
+        "dim": int(vectors.shape[1]),
+        "dtype": vectors.dtype.name,
+        "metadata": metadata or {},
+        "sections": {},
+    }
+    # Section offsets depend on the header length, which depends on the
+    # offsets; repeat until the layout stops moving (two passes in practice).
+    layout = None
+    while layout != header["sections"]:
+        layout = dict(header["sections"])
+        position = len(MAGIC) + 4 + len(json.dumps(header).encode("utf-8"))
+        position += _pad(position)
+        for name, size in sizes.items():
+            header["sections"][name] = [position, size]
+            position += size + _pad(size)
+    raw_header = json.dumps(header).encode("utf-8")
+    start = len(MAGIC) + 4 + len(raw_header)
+    first_section = header["sections"]["vectors"][0]
+
+    yield MAGIC + struct.pack("<I", len(raw_header)) + raw_header
+    yield b"\0" * (first_section - start)
+    yield vectors.tobytes()
+    yield b"\0" * _pad(vectors.nbytes)
+    yield offsets.tobytes()
+    yield b"\0" * _pad(offsets.nbytes)
+    yield from encoded
+
+
+class S3MultipartWriter:
+    """File-like sink that streams to S3 in PART_SIZE parts (one PUT if small)."""
+
+    def __init__(self, s3, bucket, key, metadata=None):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        # Extra object arguments shared by put_object and create_multipart_upload
+        self.object_args = {
+            "ContentType": "application/octet-stream",
+            "Metadata": metadata or {},
+        }
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts = []
+        self.size = 0
+
+    def write(self, data):
+        self.buffer += data
+        self.size += len(data)
+        while len(self.buffer) >= PART_SIZE:
+            self._upload_part(bytes(self.buffer[:PART_SIZE]))
+            del self.buffer[:PART_SIZE]
+
+    def _upload_part(self, body):
+        if self.upload_id is None:
+            self.upload_id = self.s3.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, **self.object_args
+            )["UploadId"]
+        number = len(self.parts) + 1
+        part = self.s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=number,
+            Body=body,
+        )
+        self.parts.append({"PartNumber": number, "ETag": part["ETag"]})
+
+    def close(self):
+        if self.upload_id is None:
+            return self.s3.put_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=bytes(self.buffer),
+                **self.object_args,
+            )
+        if self.buffer:
+            self._upload_part(bytes(self.buffer))
+            self.buffer.clear()
+        return self.s3.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": self.parts},
+        )
+
+    def abort(self):
+        if self.upload_id is not None:
+            self.s3.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def upload_index(s3, bucket, key, vectors, chunks, metadata=None, object_metadata=None):
+    """Serialize straight into an S3 (multipart) upload; returns bytes written."""
+    with S3MultipartWriter(s3, bucket, key, metadata=object_metadata) as writer:
+        for piece in iter_index_bytes(vectors, chunks, metadata):
+            writer.write(piece)
+    return writer.size
+
+
+class VectorIndex:
+    """Read side; `vectors` is a memmap/frombuffer view, texts decode lazily."""
+
+    def __init__(self, vectors, texts, metadata):
+        self.vectors = vectors
+        self._texts = texts
+        self.metadata = metadata
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+
+    def text(self, i):
+        return self._texts(i)
+
+    @classmethod
+    def from_buffer(cls, buffer):
+        # Works for both np.memmap (file on disk) and bytes (in memory)
+        raw = np.frombuffer(buffer, dtype=np.uint8)
+        if raw[: len(MAGIC)].tobytes() != MAGIC:
+            raise ValueError("not a vector index")
+        (header_length,) = struct.unpack("<I", raw[len(MAGIC) : len(MAGIC) + 4])
+        start = len(MAGIC) + 4
+        header = json.loads(raw[start : start + header_length].tobytes())
+
+        def section(name, dtype):
+            offset, nbytes = header["sections"][name]
+            return raw[offset : offset + nbytes].view(dtype)
+
+        vectors = section("vectors", header["dtype"]).reshape(
+            header["count"], header["dim"]
+        )
+        offsets = section("offsets", np.uint64)
+        texts = section("texts", np.uint8)
+
+        def text(i):
+            start, end = int(offsets[i]), int(offsets[i + 1])
+            return texts[start:end].tobytes().decode("utf-8")
+
+        return cls(vectors, text, header["metadata"])
+
+    @classmethod
+    def open(cls, path):
+        return cls.from_buffer(np.memmap(path, dtype=np.uint8, mode="r"))
+
+    @classmethod
+    def from_json(cls, data):
+        """Legacy JSON index, kept readable while indexes are migrated."""
+        index = json.loads(data)
+        raw_vectors = index.get("vectors", [])
+        chunks = index.get("chunks") or [""] * len(raw_vectors)
+        lengths = {len(vector) for vector in raw_vectors}
+        if len(lengths) > 1:
+            # Pre-embedding indexes stored ragged char codes; unusable for search
+            logger.warning(f"Ragged legacy index for {index.get('file')}; skipped")
+            raw_vectors, chunks = [], []
+        vectors = np.asarray(raw_vectors, dtype=np.float32)
+        vectors = vectors.reshape(len(raw_vectors), -1 if raw_vectors else 0)
+        metadata = {k: index[k] for k in ("file", "backend", "dim") if k in index}
+        return cls(vectors, chunks.__getitem__, metadata)
+
+
+def load_index(data, key=""):
+    """Load an index from bytes, picking the format from its content."""
+    if data[: len(MAGIC)] == MAGIC:
+        return VectorIndex.from_buffer(data)
+    if key.endswith(LEGACY_SUFFIX) or data[:1] == b"{":
+        return VectorIndex.from_json(data)
+    raise ValueError(f"Unrecognised vector index format: {key}")
@@ -19,12 +19,25 @@ resource "aws_dynamodb_table" "document_table" {
     type = "S"
   }
 
+  attribute {
+    name = "created"
+    type = "S"
+  }
+
   global_secondary_index {
     name            = "UserByStatusIndex"
     hash_key        = "userid"
     range_key       = "docstatus"
     projection_type = "ALL"
   }
+
+  global_secondary_index {
+    name               = "UserByCreatedIndex"
+    hash_key           = "userid"
+    range_key          = "created"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["filename", "pages", "indexed_pages", "filesize", "docstatus", "title", "conversations"]
+  }
   lifecycle {
     prevent_destroy = false
   }
@@ -48,3 +61,47 @@ resource "aws_dynamodb_table" "memory_table" {
     prevent_destroy = false
   }
 }
+
+resource "aws_dynamodb_table" "embedding_cache_table" {
+  name         = "${var.project_name}-embedding-cache-table"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "id"
+
+  attribute {
+    name = "id"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "ttl"
+    enabled        = true
+  }
+  lifecycle {
+    prevent_destroy = false
+  }
+}
+
+resource "aws_dynamodb_table" "answer_cache_table" {
+  name         = "${var.project_name}-answer-cache-table"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "scope"
+  range_key    = "qhash"
+
+  attribute {
+    name = "scope"
+    type = "S"
+  }
+
+  attribute {
+    name = "qhash"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "ttl"
+    enabled        = true
+  }
+  lifecycle {
+    prevent_destroy = false
+  }
+}
@@ -28,9 +28,20 @@ resource "aws_iam_policy" "lambda_policy" {
     Version = "2012-10-17",
     Statement = [
       {
-        Effect   = "Allow",
-        Action   = ["s3:GetObject", "s3:PutObject", "s3:ListBucket"],
-        Resource = "${aws_s3_bucket.main_bucket.arn}/*"
+        Effect = "Allow",
+        Action = [
+          "s3:GetObject",
+          "s3:PutObject",
+          "s3:DeleteObject",
+          "s3:ListBucket",
+          "s3:AbortMultipartUpload",
+          "s3:ListMultipartUploadParts"
+        ],
+        # ListBucket applies to the bucket itself, the rest to its objects
+        Resource = [
+          aws_s3_bucket.main_bucket.arn,
+          "${aws_s3_bucket.main_bucket.arn}/*"
+        ]
       },
 
       {
@@ -59,13 +70,18 @@ resource "aws_iam_policy" "lambda_policy" {
           "dynamodb:Scan",
           "dynamodb:Query",
           "dynamodb:PutItem",
-          "dynamodb:UpdateItem"
-
+          "dynamodb:UpdateItem",
+          "dynamodb:DeleteItem",
+          "dynamodb:BatchGetItem",
+          "dynamodb:BatchWriteItem"
         ],
         Resource = [
           "${aws_dynamodb_table.document_table.arn}",
           "${aws_dynamodb_table.memory_table.arn}",
-          "${aws_dynamodb_table.document_table.arn}/index/UserByStatusIndex"
+          "${aws_dynamodb_table.embedding_cache_table.arn}",
+          "${aws_dynamodb_table.answer_cache_table.arn}",
+          "${aws_dynamodb_table.document_table.arn}/index/UserByStatusIndex",
+          "${aws_dynamodb_table.document_table.arn}/index/UserByCreatedIndex"
         ]
       },
       {
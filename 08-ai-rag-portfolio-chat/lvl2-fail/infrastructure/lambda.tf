@@ -15,6 +15,13 @@ resource "aws_lambda_function" "lambda_function" {
       MEMORY_TABLE       = aws_dynamodb_table.memory_table.name
       DOCUMENT_TABLE     = aws_dynamodb_table.document_table.name
       QUEUE              = aws_sqs_queue.project_queue.url
+
+      EMBEDDING_CACHE_TABLE = aws_dynamodb_table.embedding_cache_table.name
+      ANSWER_CACHE_TABLE    = aws_dynamodb_table.answer_cache_table.name
+      RECORD_CONCURRENCY    = var.embedding_record_concurrency
+
+      POWERTOOLS_LOG_LEVEL          = "INFO"
+      POWERTOOLS_LOGGER_SAMPLE_RATE = var.log_sample_rate
     }
   }
   lifecycle {
@@ -26,9 +33,11 @@ resource "aws_lambda_function" "lambda_function" {
 resource "aws_lambda_function_url" "url" {
   function_name      = aws_lambda_function.lambda_function.function_name
   authorization_type = "NONE"
+  # Streams chat answers as they are generated (Lambda Web Adapter, app/server.py)
+  invoke_mode = "RESPONSE_STREAM"
   cors {
     allow_origins = ["*"]
-    allow_methods = ["GET", "POST"]
+    allow_methods = ["GET", "POST", "DELETE"]
   }
 }
 
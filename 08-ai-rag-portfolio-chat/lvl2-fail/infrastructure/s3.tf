@@ -14,6 +14,30 @@ resource "aws_s3_bucket_notification" "kb_notify" {
 
 }
 
+# Browser uploads PUT straight to presigned URLs; multipart clients need the
+# part ETag back to complete the upload.
+resource "aws_s3_bucket_cors_configuration" "uploads" {
+  bucket = aws_s3_bucket.main_bucket.id
+  cors_rule {
+    allowed_origins = ["*"]
+    allowed_methods = ["PUT"]
+    allowed_headers = ["*"]
+    expose_headers  = ["ETag"]
+    max_age_seconds = 3600
+  }
+}
+
+resource "aws_s3_bucket_lifecycle_configuration" "uploads" {
+  bucket = aws_s3_bucket.main_bucket.id
+  rule {
+    id     = "abort-incomplete-multipart-uploads"
+    status = "Enabled"
+    filter {}
+    abort_incomplete_multipart_upload {
+      days_after_initiation = var.multipart_upload_expiry_days
+    }
+  }
+}
 
 output "bucket_name" {
   value = aws_s3_bucket.main_bucket.bucket
@@ -34,8 +34,11 @@ resource "aws_sqs_queue_redrive_allow_policy" "terraform_queue_redrive_allow_pol
 resource "aws_lambda_event_source_mapping" "sqs_lambda_event" {
   event_source_arn = aws_sqs_queue.project_queue.arn
   function_name    = aws_lambda_function.lambda_function.arn
-  batch_size       = 1
+  batch_size       = var.embedding_batch_size
   enabled          = true
+
+  maximum_batching_window_in_seconds = var.embedding_batching_window
+  function_response_types            = ["ReportBatchItemFailures"]
   scaling_config {
     maximum_concurrency = 10
   }
@@ -37,6 +37,36 @@ variable "chat_model" {
   default     = "anthropic.claude-3-haiku-20240307-v1:0"
 }
 
+variable "embedding_batch_size" {
+  description = "Documents handed to one embedding worker invocation"
+  type        = number
+  default     = 4
+}
+
+variable "embedding_batching_window" {
+  description = "Seconds SQS waits to fill an embedding batch"
+  type        = number
+  default     = 5
+}
+
+variable "embedding_record_concurrency" {
+  description = "Documents embedded in parallel within one invocation"
+  type        = number
+  default     = 2
+}
+
+variable "multipart_upload_expiry_days" {
+  description = "Days before S3 aborts an unfinished multipart upload and frees its parts"
+  type        = number
+  default     = 3
+}
+
+variable "log_sample_rate" {
+  description = "Fraction of invocations logged at DEBUG, with request summaries"
+  type        = number
+  default     = 0.01
+}
+
 variable "image_uri" {
   description = "ECR image URI for the Lambda function"
   type        = string
@@ -0,0 +1,172 @@
+import hashlib
+import os
+import time
+
+import numpy as np
+from boto3.dynamodb.conditions import Key
+
+from . import utils
+from .utils import ANSWER_CACHE_TABLE, logger
+
+# Semantic cache of answers to standalone questions, one scope per document
+# (or per library query). Entries are stored in ANSWER_CACHE_TABLE keyed by
+# (scope, "<index ETag>#<sha256(question)>"), so a lookup only ever reads
+# entries answered from the current index and re-indexing a document
+# invalidates them implicitly; stale versions expire through TTL. A version
+# holds at most MAX_ENTRIES entries, the oldest is evicted to make room.
+# Each container keeps a copy of a scope's entries as one matrix and
+# refreshes it at most every LOCAL_REFRESH_SECONDS.
+
+THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.92"))
+TTL_HOURS = int(os.environ.get("ANSWER_CACHE_TTL_HOURS", "24"))
+MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "200"))
+LOCAL_REFRESH_SECONDS = 60
+
+_local = {}
+_stats = {"lookups": 0, "hits": 0, "saved_ms": 0.0}
+
+
+def enabled():
+    return bool(ANSWER_CACHE_TABLE)
+
+
+def _normalise(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class AnswerCache:
+    def __init__(self, scope, version):
+        self.scope = scope
+        self.version = version
+        self.prefix = f"{version or ''}#"
+        self.table = utils.ddb.Table(ANSWER_CACHE_TABLE)
+
+    def _entries(self):
+        cached = _local.get(self.scope)
+        if (
+            cached
+            and cached["version"] == self.version
+            and time.monotonic() - cached["loaded"] < LOCAL_REFRESH_SECONDS
+        ):
+            return cached
+
+        # Only what matching needs; the answer is fetched for the hit alone,
+        # and every page is followed (200 vectors can exceed one 1 MB page)
+        query = {
+            "KeyConditionExpression": Key("scope").eq(self.scope)
+            & Key("qhash").begins_with(self.prefix),
+            "ProjectionExpression": "#q, #v, #t, #m",
+            "ExpressionAttributeNames": {
+                "#q": "qhash",
+                "#v": "vector",
+                "#t": "ttl",
+                "#m": "answer_ms",
+            },
+        }
+        resp = self.table.query(**query)
+        items = resp.get("Items", [])
+        while "LastEvaluatedKey" in resp:
+            query["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+            resp = self.table.query(**query)
+            items.extend(resp.get("Items", []))
+        now = int(time.time())
+        items = [item for item in items if int(item["ttl"]) > now]
+        vectors = [np.frombuffer(item["vector"].value, np.float32) for item in items]
+        matrix = np.stack(vectors) if vectors else None
+        cached = {
+            "version": self.version,
+            "loaded": time.monotonic(),
+            "items": items,
+            "matrix": matrix,
+        }
+        _local[self.scope] = cached
+        return cached
+
+    def _fetch(self, qhash):
+        # None when the entry was evicted since the matrix was loaded
+        resp = self.table.get_item(
+            Key={"scope": self.scope, "qhash": qhash},
+            ProjectionExpression="#q, #u, #a, #m",
+            ExpressionAttributeNames={
+                "#q": "qhash",
+                "#u": "question",
+                "#a": "answer",
+                "#m": "answer_ms",
+            },
+        )
+        return resp.get("Item")
+
+    def lookup(self, vector):
+        entries = self._entries()
+        _stats["lookups"] += 1
+        hit = None
+        if entries["matrix"] is not None:
+            scores = entries["matrix"] @ _normalise(vector)
+            best = int(np.argmax(scores))
+            if scores[best] >= THRESHOLD:
+                hit = self._fetch(entries["items"][best]["qhash"])
+            if hit is not None:
+                hit["similarity"] = float(scores[best])
+                _stats["hits"] += 1
+                _stats["saved_ms"] += float(hit.get("answer_ms", 0))
+
+        logger.info(
+            {
+                "answer_cache_hit": hit is not None,
+                "similarity": hit["similarity"] if hit else None,
+                "saved_ms": float(hit.get("answer_ms", 0)) if hit else 0,
+                "hit_rate": round(_stats["hits"] / _stats["lookups"], 3),
+                "container_saved_ms": round(_stats["saved_ms"], 2),
+            }
+        )
+        return hit
+
+    def store(self, question, vector, answer, answer_ms):
+        qhash = self.prefix + hashlib.sha256(question.encode("utf-8")).hexdigest()
+        items = self._entries()["items"]
+        if len(items) >= MAX_ENTRIES and all(i["qhash"] != qhash for i in items):
+            # Full: make room by evicting the oldest entry of this version
+            oldest = min(items, key=lambda item: int(item["ttl"]))
+            self.table.delete_item(Key={"scope": self.scope, "qhash": oldest["qhash"]})
+        vector = _normalise(vector)
+        item = {
+            "scope": self.scope,
+            "qhash": qhash,
+            "question": question,
+            "answer": answer,
+            "vector": vector.tobytes(),
+            "version": self.version,
+            "answer_ms": str(answer_ms),
+            "ttl": int(time.time()) + TTL_HOURS * 3600,
+        }
+        self.table.put_item(Item=item)
+        _local.pop(self.scope, None)
+
+
+def scope_for(user, file_name=None, documents=None):
+    if file_name:
+        return f"{user}#{file_name}"
+    return f"{user}#library#{','.join(sorted(documents or []))}"
+
+
+def invalidate(scope):
+    # Explicit cleanup for deleted documents; re-indexing is covered by the
+    # version check, and TTL expires whatever is left.
+    if not enabled():
+        return
+    table = utils.ddb.Table(ANSWER_CACHE_TABLE)
+    query = {
+        "KeyConditionExpression": Key("scope").eq(scope),
+        "ProjectionExpression": "#s, qhash",
+        "ExpressionAttributeNames": {"#s": "scope"},
+    }
+    resp = table.query(**query)
+    items = resp.get("Items", [])
+    while "LastEvaluatedKey" in resp:
+        resp = table.query(**query, ExclusiveStartKey=resp["LastEvaluatedKey"])
+        items.extend(resp.get("Items", []))
+    with table.batch_writer() as batch:
+        for item in items:
+            batch.delete_item(Key={"scope": item["scope"], "qhash": item["qhash"]})
+    _local.pop(scope, None)
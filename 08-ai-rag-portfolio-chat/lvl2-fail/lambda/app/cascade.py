@@ -0,0 +1,115 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from . import answer_cache
+from .documents import invalidate as invalidate_listing
+from .library import update_library
+from .memory import delete_conversation
+from .vector_index import forget_s3_index
+from . import utils
+from .utils import BUCKET, QUEUE, logger
+
+# Everything a document owns, deleted concurrently:
+#   S3        every object under {user}/{name}/ (source PDF, index.vec, any
+#             legacy or future artifacts), 1000 keys per delete_objects call
+#   DynamoDB  conversation memory for each of its conversations
+#   shared    its entry in the user's library index and its answer cache
+# The document row goes last, so a failed cascade can simply be retried.
+
+CASCADE_CONCURRENCY = int(os.environ.get("CASCADE_CONCURRENCY", "8"))
+ASYNC_DELETE_PAGES = int(os.environ.get("ASYNC_DELETE_PAGES", "200"))
+DELETE_BATCH = 1000
+
+
+def document_name(filename):
+    # S3-triggered uploads store "name.pdf/name.pdf", manual ones "name.pdf"
+    return filename.split("/", 1)[0]
+
+
+def delete_keys(keys):
+    resp = utils.s3.delete_objects(
+        Bucket=BUCKET,
+        Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+    )
+    errors = resp.get("Errors", [])
+    if errors:
+        raise RuntimeError(f"Failed to delete {len(errors)} objects: {errors[:3]}")
+    return len(keys)
+
+
+def iter_key_batches(prefix):
+    paginator = utils.s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(
+        Bucket=BUCKET, Prefix=prefix, PaginationConfig={"PageSize": DELETE_BATCH}
+    ):
+        keys = [obj["Key"] for obj in page.get("Contents", [])]
+        if keys:
+            yield keys
+
+
+def delete_document_data(user_id, document):
+    name = document_name(document["filename"])
+    prefix = f"{user_id}/{name}/"
+    conversations = document.get("conversations", [])
+
+    with ThreadPoolExecutor(max_workers=CASCADE_CONCURRENCY) as pool:
+        futures = [
+            pool.submit(delete_conversation, conv["conversationid"])
+            for conv in conversations
+        ]
+        futures.append(
+            pool.submit(update_library, utils.s3, BUCKET, user_id, remove_name=name)
+        )
+        futures.append(
+            pool.submit(answer_cache.invalidate, answer_cache.scope_for(user_id, name))
+        )
+        # Listing continues on this thread while earlier batches are deleted
+        s3_futures = [
+            pool.submit(delete_keys, keys) for keys in iter_key_batches(prefix)
+        ]
+        errors = [f.exception() for f in futures + s3_futures if f.exception()]
+
+    forget_s3_index(f"{prefix}index.vec")
+    if errors:
+        for error in errors:
+            logger.error({"cascade_error": repr(error), "document": prefix})
+        raise errors[0]
+
+    utils.document_table.delete_item(
+        Key={"userid": user_id, "documentid": document["documentid"]}
+    )
+    invalidate_listing(user_id)
+    logger.info(
+        {
+            "cascade_deleted": prefix,
+            "objects": sum(f.result() for f in s3_futures),
+            "conversations": len(conversations),
+        }
+    )
+
+
+def delete_document(user_id, document_id):
+    # Entry point for queued deletes; a missing row means it already ran.
+    resp = utils.document_table.get_item(
+        Key={"userid": user_id, "documentid": document_id}
+    )
+    if "Item" in resp:
+        delete_document_data(user_id, resp["Item"])
+
+
+def should_delete_async(document, requested):
+    if requested:
+        return True
+    return int(document.get("pages") or 0) >= ASYNC_DELETE_PAGES
+
+
+def enqueue_delete(user_id, document_id):
+    utils.document_table.update_item(
+        Key={"userid": user_id, "documentid": document_id},
+        UpdateExpression="SET docstatus = :docstatus",
+        ExpressionAttributeValues={":docstatus": "DELETING"},
+    )
+    invalidate_listing(user_id)
+    message = {"action": "delete", "user": user_id, "documentid": document_id}
+    utils.sqs.send_message(QueueUrl=QUEUE, MessageBody=json.dumps(message))
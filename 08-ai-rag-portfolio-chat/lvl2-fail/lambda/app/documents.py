@@ -0,0 +1,97 @@
+import base64
+import json
+import os
+import time
+
+from boto3.dynamodb.conditions import Key
+
+from . import utils
+
+# Paginated, newest-first document listing for the dashboard. Ordering comes
+# from the CREATED_INDEX GSI (userid, created), so a page costs one Query of
+# `limit` items. Pages are cached per container for LIST_CACHE_SECONDS and
+# dropped on upload and delete; other containers catch up within the TTL.
+
+CREATED_INDEX = os.environ.get("DOCUMENT_CREATED_INDEX", "UserByCreatedIndex")
+LIST_CACHE_SECONDS = float(os.environ.get("DOCUMENT_LIST_CACHE_SECONDS", "10"))
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+MAX_CACHED_USERS = 1000
+
+LIST_ATTRIBUTES = [
+    "userid",
+    "documentid",
+    "filename",
+    "created",
+    "pages",
+    "indexed_pages",
+    "filesize",
+    "docstatus",
+    "title",
+    "conversations",
+]
+
+_pages = {}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(last_key):
+    if not last_key:
+        return None
+    raw = json.dumps(last_key, separators=(",", ":"), sort_keys=True)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(user_id, cursor):
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except ValueError as e:
+        raise InvalidCursor("Malformed cursor") from e
+    if not isinstance(key, dict) or key.get("userid") != user_id:
+        raise InvalidCursor("Cursor does not belong to this user")
+    return key
+
+
+def list_documents(user_id, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    cached = _pages.get(user_id, {}).get((limit, cursor))
+    if cached and time.monotonic() < cached[0]:
+        return cached[1]
+
+    names = {f"#a{i}": name for i, name in enumerate(LIST_ATTRIBUTES)}
+    query = {
+        "IndexName": CREATED_INDEX,
+        "KeyConditionExpression": Key("userid").eq(user_id),
+        "ScanIndexForward": False,
+        "Limit": limit,
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names,
+    }
+    start_key = decode_cursor(user_id, cursor)
+    if start_key:
+        query["ExclusiveStartKey"] = start_key
+    resp = utils.document_table.query(**query)
+
+    items = resp.get("Items", [])
+    for item in items:
+        # Conversations are only ever appended, so reversing is newest-first
+        item["conversations"] = item.get("conversations", [])[::-1]
+    page = {
+        "documents": items,
+        "nextCursor": encode_cursor(resp.get("LastEvaluatedKey")),
+    }
+
+    if len(_pages) >= MAX_CACHED_USERS:
+        _pages.clear()
+    expires = time.monotonic() + LIST_CACHE_SECONDS
+    _pages.setdefault(user_id, {})[(limit, cursor)] = (expires, page)
+    return page
+
+
+def invalidate(user_id):
+    _pages.pop(user_id, None)
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from . import utils
+from .utils import EMBEDDING_CACHE_TABLE
+
+# Two tiers keyed by (model id, sha256 of the chunk text):
+#   local   in-memory LRU per container, at most LOCAL_MAX_BYTES of vectors
+#   shared  DynamoDB table (EMBEDDING_CACHE_TABLE), shared by all workers
+# Only chunks missing from both tiers are sent to Bedrock.
+
+LOCAL_MAX_BYTES = int(os.environ.get("EMBEDDING_CACHE_LOCAL_MB", "64")) * 1024 * 1024
+TTL_DAYS = int(os.environ.get("EMBEDDING_CACHE_TTL_DAYS", "90"))
+BATCH_GET_LIMIT = 100
+
+# "{model}#{sha256}" -> float32 vector, least recently used first
+_local = OrderedDict()
+_local_bytes = 0
+_local_lock = threading.Lock()
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, model_id, table_name=EMBEDDING_CACHE_TABLE):
+        self.model_id = model_id
+        self.table_name = table_name
+        self.stats = {"local_hits": 0, "shared_hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def _key(self, digest):
+        return f"{self.model_id}#{digest}"
+
+    def _count(self, name, n):
+        if n:
+            with self._lock:
+                self.stats[name] += n
+
+    def _get_local(self, digest):
+        key = self._key(digest)
+        with _local_lock:
+            vector = _local.get(key)
+            if vector is not None:
+                _local.move_to_end(key)
+            return vector
+
+    def _put_local(self, digest, vector):
+        global _local_bytes
+        key = self._key(digest)
+        vector = np.array(vector, dtype=np.float32)
+        with _local_lock:
+            previous = _local.pop(key, None)
+            if previous is not None:
+                _local_bytes -= previous.nbytes
+            _local[key] = vector
+            _local_bytes += vector.nbytes
+            while _local_bytes > LOCAL_MAX_BYTES and _local:
+                _local_bytes -= _local.popitem(last=False)[1].nbytes
+
+    def _get_shared(self, digests):
+        found = {}
+        if not self.table_name:
+            return found
+        keys = [{"id": self._key(digest)} for digest in dict.fromkeys(digests)]
+        for start in range(0, len(keys), BATCH_GET_LIMIT):
+            request = {
+                self.table_name: {
+                    "Keys": keys[start : start + BATCH_GET_LIMIT],
+                    "ProjectionExpression": "#i, #v",
+                    "ExpressionAttributeNames": {"#i": "id", "#v": "vector"},
+                }
+            }
+            while request:
+                resp = utils.ddb.batch_get_item(RequestItems=request)
+                for item in resp["Responses"].get(self.table_name, []):
+                    digest = item["id"].rsplit("#", 1)[1]
+                    found[digest] = np.frombuffer(item["vector"].value, np.float32)
+                request = resp.get("UnprocessedKeys")
+        return found
+
+    def _put_shared(self, entries):
+        if not self.table_name or not entries:
+            return
+        expires = int(time.time()) + TTL_DAYS * 86400
+        table = utils.ddb.Table(self.table_name)
+        with table.batch_writer(overwrite_by_pkeys=["id"]) as batch:
+            for digest, vector in entries.items():
+                batch.put_item(
+                    Item={
+                        "id": self._key(digest),
+                        "vector": np.asarray(vector, dtype=np.float32).tobytes(),
+                        "ttl": expires,
+                    }
+                )
+
+    def get_many(self, texts):
+        digests = [text_hash(text) for text in texts]
+        vectors = [self._get_local(digest) for digest in digests]
+        local_hits = sum(vector is not None for vector in vectors)
+
+        missing = [d for d, v in zip(digests, vectors) if v is None]
+        shared = self._get_shared(missing) if missing else {}
+        for i, digest in enumerate(digests):
+            if vectors[i] is None and digest in shared:
+                vectors[i] = shared[digest]
+                self._put_local(digest, shared[digest])
+
+        self._count("local_hits", local_hits)
+        self._count("shared_hits", sum(1 for d in missing if d in shared))
+        self._count("misses", sum(vector is None for vector in vectors))
+        return vectors
+
+    def put_many(self, texts, vectors):
+        entries = {text_hash(text): vector for text, vector in zip(texts, vectors)}
+        for digest, vector in entries.items():
+            self._put_local(digest, vector)
+        self._put_shared(entries)
@@ -1,10 +1,12 @@
-from datetime import datetime
+import json
+from datetime import datetime, timezone
 import shortuuid
 from ..utils import (
     get_user_id,
+    get_path_param,
+    error_response,
     logger,
     document_table,
-    memory_table,
     response as stdresponse,
 )
 
@@ -12,7 +14,14 @@ from ..utils import (
 
 def handler(event):
     user_id = get_user_id(event)  
-    document_id = event["pathParameters"]["documentid"]
+    document_id = get_path_param(event, "documentid")
+    if not document_id:
+        # POST /conversation carries the document in the query or JSON body
+        params = event.get("queryStringParameters") or {}
+        body = json.loads(event.get("body") or "{}")
+        document_id = params.get("documentid") or body.get("documentid")
+    if not document_id:
+        return error_response("Missing documentid")
 
     response = document_table.get_item(
         Key={"userid": user_id, "documentid": document_id}
@@ -21,7 +30,7 @@ def handler(event):
     logger.info({"conversations": conversations})
 
     conversation_id = shortuuid.uuid()
-    timestamp = datetime.now(datetime.timezone.utc)
+    timestamp = datetime.now(timezone.utc)
     timestamp_str = timestamp.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
     conversation = {
         "conversationid": conversation_id,
@@ -34,7 +43,4 @@ def handler(event):
         UpdateExpression="SET conversations = :conversations",
         ExpressionAttributeValues={":conversations": conversations},
     )
-
-    conversation = {"SessionId": conversation_id, "History": []}
-    memory_table.put_item(Item=conversation)
     return stdresponse({"conversationid": conversation_id})
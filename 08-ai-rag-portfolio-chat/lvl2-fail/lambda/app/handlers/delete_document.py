@@ -1,10 +1,8 @@
+from ..cascade import delete_document_data, enqueue_delete, should_delete_async
 from ..utils import (
     get_user_id,
     logger,
     document_table,
-    s3,
-    BUCKET,
-    memory_table,
     response as stdresponse,
 )
 
@@ -13,32 +11,19 @@ from ..utils import (
 def handler(event):
     user_id = get_user_id(event)
     document_id = event["pathParameters"]["documentid"]
+    params = event.get("queryStringParameters") or {}
 
     response = document_table.get_item(
         Key={"userid": user_id, "documentid": document_id}
     )
     document = response["Item"]
     logger.info({"document": document})
-    logger.info("Deleting DDB items")
-    with memory_table.batch_writer() as batch:
-        for item in document["conversations"]:
-            batch.delete_item(Key={"SessionId": item["conversationid"]})
 
-    document_table.delete_item(Key={"userid": user_id, "documentid": document_id})
+    if should_delete_async(document, params.get("async") in ("1", "true")):
+        # Large documents are cleaned up by the queue worker
+        enqueue_delete(user_id, document_id)
+        return stdresponse({"documentid": document_id}, status_code=202)
 
-    logger.info("Deleting S3 objects")
-    filename = document["filename"]
-    objects = [
-        {"Key": f"{user_id}/{filename}/{key}"}
-        for key in [filename, "index.faiss", "index.pkl"]
-    ]
-    response = s3.delete_objects(
-        Bucket=BUCKET,
-        Delete={
-            "Objects": objects,
-            "Quiet": True,
-        },
-    )
-    logger.info({"Response": response})
+    delete_document_data(user_id, document)
 
     return stdresponse({}, status_code=204)
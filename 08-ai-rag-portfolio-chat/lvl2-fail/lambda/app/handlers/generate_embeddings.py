@@ -1,9 +1,20 @@
 import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import cache
+
 import boto3
-from langchain.indexes import VectorstoreIndexCreator
-from langchain_aws.embeddings import BedrockEmbeddings
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.vectorstores import FAISS
+import numpy as np
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from ..cascade import delete_document
+from ..embedding_cache import EmbeddingCache
+from ..hybrid import bm25_sections
+from ..ingest import EMBED_CONCURRENCY, ingest_pdf
+from ..library import LibraryConflict, defer_library_update, update_library
+from ..segments import SEGMENT_PAGES, delete_segments, publish_segment
+from ..vector_index import write_index
 from ..utils import (
     SOUTH_REGION,
     get_user_id,
@@ -14,6 +25,9 @@ from ..utils import (
     EMBEDDING_MODEL_ID,
 )
 
+PROGRESS_STEP = 5
+RECORD_CONCURRENCY = int(os.environ.get("RECORD_CONCURRENCY", "2"))
+
 
 def set_doc_status(user_id, document_id, status):
     document_table.update_item(
@@ -23,42 +37,185 @@ def set_doc_status(user_id, document_id, status):
     )
 
 
+def set_doc_progress(user_id, document_id, status, indexed_pages, segments=None):
+    # indexed_pages is stored as a string, like pages
+    names = {"#s": "docstatus", "#i": "indexed_pages", "#n": "segments"}
+    values = {":status": status, ":indexed": str(indexed_pages)}
+    if segments is None:
+        expression = "SET #s = :status, #i = :indexed REMOVE #n"
+    else:
+        expression = "SET #s = :status, #i = :indexed, #n = :segments"
+        values[":segments"] = segments
+    document_table.update_item(
+        Key={"userid": user_id, "documentid": document_id},
+        UpdateExpression=expression,
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values,
+    )
 
-def handler(event):
-    event_body = json.loads(event["Records"][0]["body"])
-    document_id = event_body["documentid"]
-    user_id = get_user_id(event)
-    key = event_body["key"]
-    file_name_full = key.split("/")[-1]
-
-    set_doc_status(user_id, document_id, "PROCESSING")
 
-    s3.download_file(BUCKET, key, f"/tmp/{file_name_full}")
+@cache
+def get_embeddings():
+    # Imported here so delete messages on the same queue skip langchain_aws
+    from langchain_aws.embeddings import BedrockEmbeddings
 
-    loader = PyPDFLoader(f"/tmp/{file_name_full}")
+    # Throttling retries are handled by ingest.AdaptiveBackoff, so botocore
+    # only retries once for transient network errors. Every record being
+    # processed runs its own EMBED_CONCURRENCY batch workers on this client.
     bedrock_runtime = boto3.client(
         service_name="bedrock-runtime",
         region_name=SOUTH_REGION,
+        config=Config(
+            max_pool_connections=RECORD_CONCURRENCY * EMBED_CONCURRENCY,
+            tcp_keepalive=True,
+            retries={"max_attempts": 2, "mode": "standard"},
+        ),
     )
-
-    embeddings = BedrockEmbeddings(
+    return BedrockEmbeddings(
         model_id=EMBEDDING_MODEL_ID,
         client=bedrock_runtime,
         region_name=SOUTH_REGION,
     )
 
-    index_creator = VectorstoreIndexCreator(
-        vectorstore_cls=FAISS,
-        embedding=embeddings,
-    )
 
-    index_from_loader = index_creator.from_loaders([loader])
+def merge_into_library(user_id, name):
+    # Deferred library merge; a conflict fails the record so SQS retries it
+    work_dir = f"/tmp/library-merge-{user_id}-{name}"
+    os.makedirs(work_dir, exist_ok=True)
+    index_path = f"{work_dir}/index.vec"
+    try:
+        try:
+            s3.download_file(BUCKET, f"{user_id}/{name}/index.vec", index_path)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                logger.info({"library_merge_skipped": name, "reason": "deleted"})
+                return
+            raise
+        update_library(s3, BUCKET, user_id, add_name=name, add_path=index_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
 
-    index_from_loader.vectorstore.save_local("/tmp")
 
-    s3.upload_file(
-        "/tmp/index.faiss", BUCKET, f"{user_id}/{file_name_full}/index.faiss"
-    )
-    s3.upload_file("/tmp/index.pkl", BUCKET, f"{user_id}/{file_name_full}/index.pkl")
+def process_record(record):
+    event_body = json.loads(record["body"])
+    user_id = event_body.get("user") or get_user_id(record)
+    if event_body.get("action") == "library":
+        merge_into_library(user_id, event_body["name"])
+        return
+    document_id = event_body["documentid"]
+    if event_body.get("action") == "delete":
+        delete_document(user_id, document_id)
+        return
+
+    key = event_body["key"]
+    file_name_full = key.split("/")[-1]
+
+    # Records run side by side, so every document gets its own /tmp directory.
+    work_dir = f"/tmp/{document_id}"
+    os.makedirs(work_dir, exist_ok=True)
+    pdf_path = f"{work_dir}/{file_name_full}"
+    index_path = f"{work_dir}/index.vec"
+
+    document_prefix = f"{user_id}/{file_name_full}/"
+    metadata = {"source": file_name_full, "model": EMBEDDING_MODEL_ID}
+
+    try:
+        set_doc_status(user_id, document_id, "PROCESSING")
+        # Segments of an earlier, failed attempt would duplicate chunks
+        delete_segments(s3, BUCKET, document_prefix)
+
+        s3.download_file(BUCKET, key, pdf_path)
+
+        vectors, texts, pages = [], [], []
+        reported = 0
+        # Rows and pages already published as segments
+        segments, segment_batches, segment_rows, segment_pages = 0, 0, 0, 0
+        total = 0
+        batches = ingest_pdf(
+            pdf_path,
+            get_embeddings(),
+            cache=EmbeddingCache(EMBEDDING_MODEL_ID),
+        )
+        for batch_vectors, batch_texts, batch_pages, pages_done, total in batches:
+            vectors.append(np.asarray(batch_vectors, dtype=np.float32))
+            texts.extend(batch_texts)
+            pages.extend(batch_pages)
+
+            percent = pages_done * 100 // max(total, 1)
+            # Pages before the batch's last page are complete; that one may
+            # continue in the next batch.
+            indexed_pages = batch_pages[-1]
+            if indexed_pages - segment_pages >= SEGMENT_PAGES and pages_done < total:
+                publish_segment(
+                    s3,
+                    BUCKET,
+                    document_prefix,
+                    segments,
+                    np.concatenate(vectors[segment_batches:]),
+                    texts[segment_rows:],
+                    pages[segment_rows:],
+                    work_dir,
+                    {**metadata, "indexed_pages": indexed_pages, "pages": total},
+                )
+                segments += 1
+                segment_batches, segment_rows = len(vectors), len(texts)
+                segment_pages = indexed_pages
+                set_doc_progress(
+                    user_id,
+                    document_id,
+                    f"PROCESSING {percent}%",
+                    indexed_pages,
+                    segments,
+                )
+                reported = percent
+            elif percent - reported >= PROGRESS_STEP and percent < 100:
+                set_doc_status(user_id, document_id, f"PROCESSING {percent}%")
+                reported = percent
+
+        write_index(
+            index_path,
+            np.concatenate(vectors) if vectors else [],
+            texts,
+            pages=pages,
+            metadata=metadata,
+            extra_sections=bm25_sections(texts),
+        )
+
+        s3.upload_file(index_path, BUCKET, f"{document_prefix}index.vec")
+        try:
+            update_library(
+                s3, BUCKET, user_id, add_name=file_name_full, add_path=index_path
+            )
+        except LibraryConflict:
+            # The document itself is indexed; only the shared library lags
+            defer_library_update(user_id, file_name_full)
+
+        set_doc_progress(user_id, document_id, "READY", total)
+        if segments:
+            delete_segments(s3, BUCKET, document_prefix)
+    except Exception:
+        set_doc_status(user_id, document_id, "FAILED")
+        raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def handler(event):
+    # Every record in the batch is processed; only the failed ones are
+    # reported back to SQS for redelivery.
+    records = event["Records"]
+    failures = []
+    with ThreadPoolExecutor(max_workers=RECORD_CONCURRENCY) as pool:
+        futures = {pool.submit(process_record, record): record for record in records}
+        for future in as_completed(futures):
+            record = futures[future]
+            try:
+                future.result()
+            except Exception:
+                logger.exception(
+                    "Embedding failed", extra={"messageId": record["messageId"]}
+                )
+                failures.append({"itemIdentifier": record["messageId"]})
 
-    set_doc_status(user_id, document_id, "READY")
+    logger.info({"records": len(records), "failed": len(failures)})
+    return {"batchItemFailures": failures}
@@ -1,86 +1,168 @@
 from typing import Dict, Any
+import itertools
 import json
-import boto3
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
+from .. import answer_cache, rag
+from ..memory import ConversationMemory
+from ..planner import plan_retrieval
+from ..reindex import reindex_document
+from ..library import library_key, open_library
+from ..segments import open_document_index
+from ..vector_index import s3_index_etag
+from ..request_log import MAX_VALUE_CHARS
 from ..utils import (
     logger,
     s3,
+    timed,
     BUCKET,
-    EMBEDDING_MODEL_ID,
-    MEMORY_TABLE,
-    MODEL_ID,
     response as stdresponse,
+    stream_response,
 )
 
-from langchain_community.vectorstores import FAISS
-from langchain_aws.embeddings import BedrockEmbeddings
-from langchain_aws.chat_models import ChatBedrock
-from langchain_community.chat_message_histories import DynamoDBChatMessageHistory
 
+def _source(doc):
+    return {
+        "source": doc.metadata.get("source"),
+        "page": doc.metadata.get("page"),
+        "preview": doc.page_content[:200],
+    }
 
 
-def handler(event):
-    body = json.loads(event["body"])
-    user = event["requestContext"]["authorizer"]["claims"]["sub"]
-    file_name = body["fileName"]
-    human_input = body["prompt"]
-    conversation_id = event["pathParameters"]["conversationid"]
+def save_turn(memory, question, answer, timings):
+    with timed(timings, "memory_ms"):
+        pending = memory.append_turn(question, answer)
+        if memory.needs_compaction(pending):
+            memory.compact(rag.get_contextualize_llm())
 
-    # Download FAISS index
-    local_dir = "/tmp"
-    s3.download_file(
-        BUCKET, f"{user}/{file_name}/index.faiss", f"{local_dir}/index.faiss"
-    )
-    s3.download_file(BUCKET, f"{user}/{file_name}/index.pkl", f"{local_dir}/index.pkl")
 
-    embeddings = BedrockEmbeddings(
-        model_id=EMBEDDING_MODEL_ID,
-        client=boto3.client("bedrock-runtime"),
-        region_name="us-east-1",
-    )
-    faiss_index = FAISS.load_local(
-        local_dir, embeddings, allow_dangerous_deserialization=True
-    )
+def cached_answer_events(hit):
+    yield {"type": "token", "text": hit["answer"]}
+    yield {"type": "done", "answer": hit["answer"], "cached": True}
 
-    message_history = DynamoDBChatMessageHistory(
-        table_name=MEMORY_TABLE, session_id=conversation_id
-    )
 
-    # Prompt to convert follow-up questions into standalone queries
-    contextualize_prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", "Make the follow-up question standalone based on chat history."),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}"),
-        ]
-    )
+def stream_answer(chain, inputs, memory, timings, on_answer=None):
+    # Sources are known before generation starts, so they go out first, then
+    # answer tokens as Bedrock produces them. The turn is persisted once the
+    # stream completes.
+    yield {"type": "sources", "sources": [_source(doc) for doc in inputs["context"]]}
+    answer = []
+    with timed(timings, "stream_ms"):
+        for chunk in chain.stream(inputs):
+            if chunk:
+                answer.append(chunk)
+                yield {"type": "token", "text": chunk}
 
-    history_aware_retriever = create_history_aware_retriever(
-        ChatBedrock(model_id=MODEL_ID, model_kwargs={"temperature": 0.0}),
-        faiss_index.as_retriever(),
-        contextualize_prompt,
-    )
+    answer = "".join(answer)
+    save_turn(memory, inputs["input"], answer, timings)
+    if on_answer:
+        on_answer(answer, timings["stream_ms"])
+    logger.info({"timings": timings})
+    yield {"type": "done", "answer": answer}
 
-    # Prompt for answering using context + history
-    qa_prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", "Answer using only the retrieved context."),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}"),
-        ]
+
+def rewrite_question(question, chat_history):
+    return rag.get_rewrite_chain().invoke(
+        {"input": question, "chat_history": chat_history}
     )
 
-    doc_chain = create_stuff_documents_chain(ChatBedrock(model_id=MODEL_ID), qa_prompt)
 
-    chain = create_retrieval_chain(history_aware_retriever, doc_chain)
+def handler(event):
+    timings = {}
+    cold_start = rag.is_cold_start()
 
-    result = chain.invoke(
-        {"input": human_input, "chat_history": message_history.messages}
-    )
+    body = json.loads(event["body"])
+    user = event["requestContext"]["authorizer"]["claims"]["sub"]
+    file_name = body.get("fileName")
+    human_input = body["prompt"]
+    conversation_id = event["pathParameters"]["conversationid"]
 
-    logger.info(f"Response: {result.get('output')}")
+    with timed(timings, "init_ms"):
+        chain = rag.get_answer_chain()
+
+    # Fetch (or revalidate the cached) vector index for this document, or the
+    # user's merged library index when asking across documents
+    documents, partial = None, None
+    with timed(timings, "index_ms"):
+        if file_name and body.get("scope") != "library":
+            index_key = f"{user}/{file_name}/index.vec"
+            # Still ingesting: answer from the segments published so far
+            index, partial = open_document_index(s3, BUCKET, f"{user}/{file_name}/")
+            if index is None:
+                # Legacy FAISS-only documents are queued for re-ingestion
+                if reindex_document(user, file_name):
+                    message = "Document is being re-indexed, try again shortly"
+                    return stdresponse({"error": message}, 409)
+                return stdresponse({"error": "Document is not indexed yet"}, 409)
+        else:
+            file_name = None
+            index_key = library_key(user)
+            index = open_library(s3, BUCKET, user)
+            if index is None:
+                return stdresponse({"error": "No indexed documents"}, 404)
+            if body.get("fileNames"):
+                documents = set(body["fileNames"])
+
+    with timed(timings, "history_ms"):
+        memory = ConversationMemory(conversation_id).load()
+        chat_history = memory.messages()
+
+    # Without history the prompt is already a standalone question, so it can
+    # be matched against earlier answers for the same document.
+    cache, query_vectors = None, {}
+    if answer_cache.enabled() and not chat_history and partial is None:
+        with timed(timings, "answer_cache_ms"):
+            question_vector = rag.get_embeddings().embed_query(human_input)
+            query_vectors[human_input] = question_vector
+            cache = answer_cache.AnswerCache(
+                answer_cache.scope_for(user, file_name, documents),
+                s3_index_etag(index_key),
+            )
+            hit = cache.lookup(question_vector)
+        if hit:
+            save_turn(memory, human_input, hit["answer"], timings)
+            logger.info({"cold_start": cold_start, "timings": timings})
+            if body.get("stream"):
+                return stream_response(cached_answer_events(hit))
+            return stdresponse({"answer": hit["answer"], "cached": True})
+
+    def remember(answer, answer_ms):
+        if cache is not None and answer:
+            cache.store(human_input, query_vectors[human_input], answer, answer_ms)
+
+    retrieve = rag.index_retriever(
+        index, documents=documents, query_vectors=query_vectors
+    )
+    docs, query, strategy = plan_retrieval(
+        human_input, chat_history, retrieve, rewrite_question, timings
+    )
+    logger.info({"retrieval_plan": strategy, "query_chars": len(query)})
+    logger.debug({"query": query[:MAX_VALUE_CHARS]})
+
+    inputs = {"input": human_input, "chat_history": chat_history, "context": docs}
+
+    if body.get("stream"):
+        logger.info({"cold_start": cold_start, "stream": True, "partial": partial})
+        events = stream_answer(chain, inputs, memory, timings, remember)
+        if partial:
+            events = itertools.chain([{"type": "partial", **partial}], events)
+        return stream_response(events)
+
+    with timed(timings, "answer_ms"):
+        answer = chain.invoke(inputs)
+
+    save_turn(memory, human_input, answer, timings)
+    remember(answer, timings["answer_ms"])
+
+    logger.info(
+        {
+            "cold_start": cold_start,
+            "timings": timings,
+            "answer_chars": len(answer),
+            "partial": partial,
+        }
+    )
+    logger.debug({"answer": answer[:MAX_VALUE_CHARS]})
 
-    return stdresponse({"answer": result.get("output")})
+    if partial:
+        return stdresponse({"answer": answer, "partial": partial})
+    return stdresponse({"answer": answer})
@@ -1,16 +1,18 @@
-from ..utils import get_user_id, logger, document_table, response as stdresponse
-from boto3.dynamodb.conditions import Key
+from ..documents import DEFAULT_PAGE_SIZE, list_documents
+from ..utils import get_user_id, logger, error_response, response as stdresponse
 
 
 
 def handler(event):
     user_id = get_user_id(event)
-    response = document_table.query(KeyConditionExpression=Key("userid").eq(user_id))
-    items = sorted(response["Items"], key=lambda item: item["created"], reverse=True)
-    for item in items:
-        item["conversations"] = sorted(
-            item["conversations"], key=lambda conv: conv["created"], reverse=True
-        )
-    logger.info({"items": items})
+    params = event.get("queryStringParameters") or {}
+    try:
+        limit = int(params.get("limit") or DEFAULT_PAGE_SIZE)
+        page = list_documents(user_id, limit=limit, cursor=params.get("cursor"))
+    except ValueError as e:
+        return error_response(str(e))
+    logger.info(
+        {"documents": len(page["documents"]), "has_more": bool(page["nextCursor"])}
+    )
 
-    return stdresponse(body=items)
+    return stdresponse(body=page)
@@ -1,5 +1,6 @@
 from app.utils import response, get_path_param
-from ..utils import get_user_id, logger, document_table, memory_table
+from ..memory import HISTORY_PAGE_TURNS, ConversationMemory
+from ..utils import get_user_id, logger, document_table
 
 
 
@@ -23,17 +24,29 @@ def handler(event):
             reverse=True,
         )
 
-        mem_resp = memory_table.get_item(Key={"SessionId": conversation_id})
-        messages = mem_resp.get("Item", {}).get("History", [])
+        # GET /doc/{documentid} has no conversation id: use the newest one
+        if not conversation_id and document["conversations"]:
+            conversation_id = document["conversations"][0].get("conversationid", "")
+        # Newest page of the transcript; ?before=<nextBefore> pages back
+        params = event.get("queryStringParameters") or {}
+        messages, next_before = [], None
+        if conversation_id:
+            messages, next_before = ConversationMemory(conversation_id).history(
+                before=params.get("before"),
+                limit=params.get("limit") or HISTORY_PAGE_TURNS,
+            )
 
         return response(
             {
                 "conversationid": conversation_id,
                 "document": document,
                 "messages": messages,
+                "nextBefore": next_before,
             }
         )
 
+    except ValueError as e:
+        return response({"error": str(e)}, 400)
     except Exception as e:
         logger.exception("Error in get_document")
         return response({"error": str(e)}, 500)
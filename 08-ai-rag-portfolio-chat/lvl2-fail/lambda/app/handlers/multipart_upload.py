@@ -0,0 +1,86 @@
+import json
+
+from botocore.exceptions import ClientError
+
+from .. import uploads
+from ..utils import (
+    get_user_id,
+    get_path_param,
+    logger,
+    error_response,
+    response as stdresponse,
+)
+
+# POST   /upload/multipart                     {file_name, size} -> key, part URLs
+# POST   /upload/multipart/{uploadid}/parts    {key, partNumbers} -> URLs + uploaded
+# POST   /upload/multipart/{uploadid}/complete {key, parts?}
+# DELETE /upload/multipart/{uploadid}?key=...
+
+
+def _body(event):
+    return json.loads(event.get("body") or "{}")
+
+
+def _upload(event, body=None):
+    user_id = get_user_id(event)
+    params = event.get("queryStringParameters") or {}
+    key = (body or {}).get("key") or params.get("key")
+    uploads.check_owner(user_id, key)
+    return key, get_path_param(event, "uploadid")
+
+
+def _errors(handler):
+    def wrapper(event):
+        try:
+            return handler(event)
+        except (ValueError, KeyError, TypeError) as e:
+            return error_response(str(e), 400)
+        except PermissionError as e:
+            return error_response(str(e), 403)
+        except FileExistsError as e:
+            return error_response(str(e), 409)
+        except ClientError as e:
+            code = e.response["Error"]["Code"]
+            if code == "NoSuchUpload":
+                return error_response("Upload not found or already finished", 404)
+            logger.exception("Multipart upload request failed")
+            return error_response(code, 502)
+
+    return wrapper
+
+
+@_errors
+def initiate(event):
+    body = _body(event)
+    result = uploads.initiate(get_user_id(event), body["file_name"], int(body["size"]))
+    return stdresponse(result, status_code=201)
+
+
+@_errors
+def sign_parts(event):
+    # Also the resume call: the client re-signs whatever is not in "uploaded"
+    body = _body(event)
+    key, upload_id = _upload(event, body)
+    numbers = [int(n) for n in body.get("partNumbers") or []]
+    return stdresponse(
+        {
+            "key": key,
+            "uploadId": upload_id,
+            "parts": uploads.sign_parts(key, upload_id, numbers),
+            "uploaded": uploads.uploaded_parts(key, upload_id),
+        }
+    )
+
+
+@_errors
+def complete(event):
+    body = _body(event)
+    key, upload_id = _upload(event, body)
+    return stdresponse(uploads.complete(key, upload_id, body.get("parts")))
+
+
+@_errors
+def abort(event):
+    key, upload_id = _upload(event)
+    uploads.abort(key, upload_id)
+    return stdresponse({}, status_code=204)
@@ -1,15 +1,15 @@
 import urllib
 from zoneinfo import ZoneInfo
 import shortuuid
-import PyPDF2
 from datetime import datetime, timezone
 import json
 
+from ..documents import invalidate as invalidate_listing
+from ..pdf_probe import probe_s3_pdf
 from ..utils import (
     logger,
     document_table,
     s3,
-    memory_table,
     BUCKET,
     sqs,
     QUEUE,
@@ -19,10 +19,10 @@ from ..utils import (
 local_timezone = ZoneInfo("Asia/Kolkata")  # Replace with your actual timezone
 
 def handler(event):
-    logger.info("Triggered by S3 event", extra={"event": event})
     try:
         key = urllib.parse.unquote_plus(event["Records"][0]["s3"]["object"]["key"])
         user_id, file_name = key.split("/", 1)
+        logger.info({"s3_upload": key, "records": len(event["Records"])})
 
         document_id = shortuuid.uuid()
         conversation_id = shortuuid.uuid()
@@ -33,28 +33,25 @@ def handler(event):
             .replace(":", "")
         )
        
-        # Download and read file
-        local_path = f"/tmp/{file_name}"
-        s3.download_file(BUCKET, key, local_path)
-
-        with open(local_path, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            pages = str(len(reader.pages))
+        # Page count and title from ranged reads of the xref and catalog only
+        size = event["Records"][0]["s3"]["object"].get("size")
+        pdf = probe_s3_pdf(s3, BUCKET, key, size=size)
 
         document = {
             "userid": user_id,
             "documentid": document_id,
             "filename": file_name,
             "created": timestamp,
-            "pages": pages,
-            "filesize": str(event["Records"][0]["s3"]["object"]["size"]),
+            "pages": str(pdf["pages"]),
+            "filesize": str(pdf["size"]),
             "docstatus": "UPLOADED",
             "conversations": [
                 {"conversationid": conversation_id, "created": timestamp}
             ],
         }
+        if pdf["title"]:
+            document["title"] = pdf["title"]
 
-        memory = {"SessionId": conversation_id, "History": []}
         message = {
             "documentid": document_id,
             "key": key,
@@ -63,7 +60,7 @@ def handler(event):
 
         # Save to DynamoDB
         document_table.put_item(Item=document)
-        memory_table.put_item(Item=memory)
+        invalidate_listing(user_id)
 
         # Send to SQS
         sqs.send_message(QueueUrl=QUEUE, MessageBody=json.dumps(message))
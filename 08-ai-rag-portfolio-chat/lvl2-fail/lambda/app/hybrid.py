@@ -0,0 +1,156 @@
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from functools import cache
+
+import numpy as np
+
+from .utils import logger
+
+# BM25 postings are written into index.vec as extra sections at ingest time:
+#   bm25_vocab          utf-8 terms, sorted, "\n"-separated
+#   bm25_term_offsets   uint64 x (V + 1) into the postings arrays
+#   bm25_post_rows      uint32 row ids, grouped by term
+#   bm25_post_tf        uint16 term frequency per posting
+#   bm25_doc_len        uint32 token count per row
+# Query time fuses the BM25 and dense rankings with reciprocal-rank fusion.
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+CANDIDATES_PER_K = 5
+RERANKER_MODEL = os.environ.get("RERANKER_MODEL")
+
+# Keeps part numbers, versions and error codes ("ab-1234", "v2.1", "0x1f") whole
+TOKEN_RE = re.compile(r"\w[\w.\-/]*\w|\w")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def bm25_sections(texts):
+    postings = defaultdict(list)
+    doc_len = np.zeros(len(texts), dtype=np.uint32)
+    for row, text in enumerate(texts):
+        counts = Counter(tokenize(text))
+        doc_len[row] = sum(counts.values())
+        for term, tf in counts.items():
+            postings[term].append((row, min(tf, 65535)))
+
+    vocab = sorted(postings)
+    offsets = np.zeros(len(vocab) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(postings[term]) for term in vocab], dtype=np.uint64)
+    flat = [posting for term in vocab for posting in postings[term]]
+    rows = np.fromiter((row for row, _ in flat), dtype=np.uint32, count=len(flat))
+    tfs = np.fromiter((tf for _, tf in flat), dtype=np.uint16, count=len(flat))
+
+    return [
+        ("bm25_vocab", np.frombuffer("\n".join(vocab).encode("utf-8"), np.uint8)),
+        ("bm25_term_offsets", offsets),
+        ("bm25_post_rows", rows),
+        ("bm25_post_tf", tfs),
+        ("bm25_doc_len", doc_len),
+    ]
+
+
+class Bm25:
+    def __init__(self, index):
+        self.count = index.count
+        raw_vocab = index.section("bm25_vocab", np.uint8).tobytes().decode("utf-8")
+        self.term_ids = {
+            term: i for i, term in enumerate(raw_vocab.split("\n")) if term
+        }
+        self.offsets = index.section("bm25_term_offsets", np.uint64)
+        self.rows = index.section("bm25_post_rows", np.uint32)
+        self.tfs = index.section("bm25_post_tf", np.uint16)
+        self.doc_len = index.section("bm25_doc_len", np.uint32).astype(np.float32)
+        self.avgdl = float(self.doc_len.mean()) if self.count else 0.0
+
+    def scores(self, query):
+        scores = np.zeros(self.count, dtype=np.float32)
+        if not self.count:
+            return scores
+        length_ratio = self.doc_len / max(self.avgdl, 1e-9)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * length_ratio)
+        for term in set(tokenize(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = int(self.offsets[term_id]), int(self.offsets[term_id + 1])
+            rows = self.rows[start:end]
+            tf = self.tfs[start:end].astype(np.float32)
+            df = end - start
+            idf = math.log(1 + (self.count - df + 0.5) / (df + 0.5))
+            scores[rows] += idf * tf * (BM25_K1 + 1) / (tf + norm[rows])
+        return scores
+
+
+def get_bm25(index):
+    # Built once per open index; the vocab dict is the only non-mmap part.
+    if not index.has_section("bm25_vocab"):
+        return None
+    if "bm25" not in vars(index):
+        index.bm25 = Bm25(index)
+    return index.bm25
+
+
+def _top(scores, n, mask):
+    if mask is not None:
+        scores = np.where(mask, scores, -np.inf)
+        n = min(n, int(mask.sum()))
+    n = min(n, len(scores))
+    if n <= 0:
+        return []
+    top = np.argpartition(-scores, n - 1)[:n]
+    top = top[np.argsort(-scores[top])]
+    return [int(i) for i in top if np.isfinite(scores[i])]
+
+
+def reciprocal_rank_fusion(*rankings):
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            fused[row] += 1.0 / (RRF_K + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+@cache
+def get_reranker():
+    if not RERANKER_MODEL:
+        return None
+    try:
+        from sentence_transformers import CrossEncoder
+    except ImportError:
+        logger.warning("RERANKER_MODEL set but sentence-transformers not installed")
+        return None
+    return CrossEncoder(RERANKER_MODEL)
+
+
+def hybrid_search(index, query, query_vector, k=4, documents=None):
+    # Returns [(row, score)] best first. Falls back to dense-only search for
+    # indexes written before postings existed.
+    bm25 = get_bm25(index)
+    if bm25 is None:
+        return index.search(query_vector, k, documents=documents)
+
+    mask = index.document_mask(documents)
+    candidates = k * CANDIDATES_PER_K
+    dense = _top(index.scores(query_vector), candidates, mask)
+    lexical_scores = bm25.scores(query)
+    matched = lexical_scores > 0
+    lexical = _top(
+        lexical_scores, candidates, matched if mask is None else matched & mask
+    )
+    fused = reciprocal_rank_fusion(dense, lexical)
+
+    reranker = get_reranker()
+    if reranker is not None and fused:
+        rows = [row for row, _ in fused[:candidates]]
+        scores = reranker.predict([(query, index.text(row)) for row in rows])
+        fused = sorted(
+            zip(rows, map(float, scores)), key=lambda item: item[1], reverse=True
+        )
+
+    return fused[:k]
@@ -0,0 +1,141 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pypdf
+
+from .utils import logger
+
+CHUNK_SIZE = int(os.environ.get("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.environ.get("CHUNK_OVERLAP", "0"))
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "16"))
+EMBED_CONCURRENCY = int(os.environ.get("EMBED_CONCURRENCY", "8"))
+EMBED_MAX_RETRIES = int(os.environ.get("EMBED_MAX_RETRIES", "6"))
+
+THROTTLE_MARKERS = ("ThrottlingException", "TooManyRequests", "Too many requests")
+
+
+def get_splitter():
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+    )
+
+
+class AdaptiveBackoff:
+    # Shared by all embedding threads: a throttle anywhere slows every worker
+    # down, and successes gradually bring the delay back to zero.
+    def __init__(self, base=0.2, ceiling=20.0):
+        self.base = base
+        self.ceiling = ceiling
+        self.delay = 0.0
+        self.throttles = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        delay = self.delay
+        if delay:
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def throttled(self):
+        with self._lock:
+            self.throttles += 1
+            self.delay = min(self.ceiling, max(self.base, self.delay * 2))
+
+    def succeeded(self):
+        with self._lock:
+            self.delay = self.delay / 2 if self.delay > self.base else 0.0
+
+
+def _is_throttle(error):
+    return any(marker in str(error) for marker in THROTTLE_MARKERS)
+
+
+def embed_text(embeddings, text, backoff):
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        backoff.wait()
+        try:
+            vector = embeddings.embed_documents([text])[0]
+        except Exception as e:
+            if not _is_throttle(e) or attempt == EMBED_MAX_RETRIES:
+                raise
+            backoff.throttled()
+            continue
+        backoff.succeeded()
+        return vector
+
+
+def embed_batch(embeddings, texts, backoff, cache=None):
+    # Titan embeds one text per request, so a batch is the unit of work handed
+    # to a thread while retries stay per chunk. Cached chunks skip Bedrock.
+    if cache is None:
+        return [embed_text(embeddings, text, backoff) for text in texts]
+
+    vectors = cache.get_many(texts)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    fresh = [embed_text(embeddings, texts[i], backoff) for i in missing]
+    for i, vector in zip(missing, fresh):
+        vectors[i] = vector
+    cache.put_many([texts[i] for i in missing], fresh)
+    return vectors
+
+
+def iter_page_chunks(reader, splitter):
+    for number, page in enumerate(reader.pages):
+        for chunk in splitter.split_text(page.extract_text() or ""):
+            yield number, chunk
+
+
+def ingest_pdf(path, embeddings, splitter=None, cache=None):
+    """Embed a PDF page by page and yield batches in document order.
+
+    Each item is (vectors, texts, pages, pages_done, total_pages). At most
+    2 x EMBED_CONCURRENCY batches are in flight, so memory stays bounded by
+    the batch size rather than the document size.
+    """
+    reader = pypdf.PdfReader(path)
+    total_pages = len(reader.pages)
+    splitter = splitter or get_splitter()
+    backoff = AdaptiveBackoff()
+    started = time.perf_counter()
+    chunks = 0
+
+    def collect(item):
+        future, texts, pages = item
+        return future.result(), texts, pages, pages[-1] + 1, total_pages
+
+    with ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY) as pool:
+        in_flight = deque()
+        texts, pages = [], []
+
+        for number, chunk in iter_page_chunks(reader, splitter):
+            texts.append(chunk)
+            pages.append(number)
+            if len(texts) == EMBED_BATCH_SIZE:
+                future = pool.submit(embed_batch, embeddings, texts, backoff, cache)
+                in_flight.append((future, texts, pages))
+                chunks += len(texts)
+                texts, pages = [], []
+            while len(in_flight) >= 2 * EMBED_CONCURRENCY:
+                yield collect(in_flight.popleft())
+
+        if texts:
+            future = pool.submit(embed_batch, embeddings, texts, backoff, cache)
+            in_flight.append((future, texts, pages))
+            chunks += len(texts)
+        while in_flight:
+            yield collect(in_flight.popleft())
+
+    logger.info(
+        {
+            "ingested_pages": total_pages,
+            "ingested_chunks": chunks,
+            "throttles": backoff.throttles,
+            "embedding_cache": cache.stats if cache else None,
+            "ingest_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+    )
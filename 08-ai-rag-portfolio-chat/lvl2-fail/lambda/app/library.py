@@ -0,0 +1,282 @@
+import json
+import os
+import random
+import threading
+import time
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+from .hybrid import bm25_sections
+from . import utils
+from .utils import QUEUE, logger
+from .vector_index import (
+    INDEX_DTYPE,
+    VectorIndex,
+    fetch_s3_index,
+    forget_s3_index,
+    quantise,
+    write_index,
+    write_sections,
+)
+
+# One merged index per user holding the chunks of every READY document.
+# Each row carries a doc_ids slot, so a single top-k query can search the
+# whole library or any subset of it.
+
+UPDATE_ATTEMPTS = 5
+BACKOFF_BASE = 0.2
+BACKOFF_CEILING = 5.0
+DEFER_SECONDS = int(os.environ.get("LIBRARY_DEFER_SECONDS", "30"))
+CONFLICT_CODES = ("PreconditionFailed", "ConditionalRequestConflict", "412")
+
+
+class LibraryConflict(RuntimeError):
+    pass
+
+
+def library_key(user_id):
+    return f"{user_id}/_library/index.vec"
+
+
+def fetch_library(s3, bucket, user_id):
+    # (ETag, index), or (None, None) before the first document is merged
+    try:
+        return fetch_s3_index(s3, bucket, library_key(user_id))
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            return None, None
+        raise
+
+
+def open_library(s3, bucket, user_id):
+    return fetch_library(s3, bucket, user_id)[1]
+
+
+def _rebuild(base, path, add_name, add_index, dropped):
+    # Full decode and re-encode, for inputs without BM25 sections or doc_ids
+    vectors, texts, pages, names = [], [], [], []
+
+    if base is not None and base.count:
+        keep = np.array(
+            [base.source(i) not in dropped for i in range(base.count)], dtype=bool
+        )
+        rows = np.flatnonzero(keep)
+        vectors.append(base.dense(rows))
+        texts.extend(base.text(i) for i in rows)
+        pages.extend(base.page(i) for i in rows)
+        names.extend(base.source(i) for i in rows)
+
+    if add_index is not None and add_index.count:
+        vectors.append(add_index.dense())
+        texts.extend(add_index.text(i) for i in range(add_index.count))
+        pages.extend(add_index.page(i) for i in range(add_index.count))
+        names.extend([add_name] * add_index.count)
+
+    documents = list(dict.fromkeys(names))
+    slots = {name: slot for slot, name in enumerate(documents)}
+    dim = vectors[0].shape[1] if vectors else 0
+    write_index(
+        path,
+        np.concatenate(vectors) if vectors else np.zeros((0, dim), np.float32),
+        texts,
+        pages=pages,
+        metadata={"documents": documents},
+        doc_ids=[slots[name] for name in names],
+        extra_sections=bm25_sections(texts),
+    )
+    return path
+
+
+def _postings(index, keep=None, row_base=0):
+    # (vocab, term ids, rows, tfs) of an index's BM25 sections, with only the
+    # kept rows, renumbered and shifted by row_base
+    offsets = index.section("bm25_term_offsets", np.uint64).astype(np.int64)
+    vocab = index.section("bm25_vocab", np.uint8).tobytes().decode("utf-8")
+    vocab = vocab.split("\n")[: len(offsets) - 1]
+    rows = index.section("bm25_post_rows", np.uint32).astype(np.int64)
+    tfs = index.section("bm25_post_tf", np.uint16)
+    term_ids = np.repeat(np.arange(len(vocab)), np.diff(offsets))
+    if keep is not None:
+        mask = keep[rows]
+        renumber = np.cumsum(keep) - 1
+        term_ids, rows, tfs = term_ids[mask], renumber[rows[mask]], tfs[mask]
+    return vocab, term_ids, rows + row_base, tfs
+
+
+def _merge_postings(parts, doc_len):
+    # Same layout as hybrid.bm25_sections; terms left without postings go
+    vocab = sorted(
+        {vocab[i] for vocab, term_ids, _, _ in parts for i in np.unique(term_ids)}
+    )
+    slots = {term: i for i, term in enumerate(vocab)}
+    term_ids, rows, tfs = [np.zeros(0, np.int64)], [np.zeros(0, np.int64)], []
+    for part_vocab, part_terms, part_rows, part_tfs in parts:
+        lookup = np.array([slots.get(term, -1) for term in part_vocab], np.int64)
+        term_ids.append(lookup[part_terms])
+        rows.append(part_rows)
+        tfs.append(part_tfs)
+    term_ids, rows = np.concatenate(term_ids), np.concatenate(rows)
+    tfs = np.concatenate(tfs or [np.zeros(0, np.uint16)])
+    order = np.lexsort((rows, term_ids))
+    offsets = np.zeros(len(vocab) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum(np.bincount(term_ids, minlength=len(vocab)))
+    return [
+        ("bm25_vocab", np.frombuffer("\n".join(vocab).encode("utf-8"), np.uint8)),
+        ("bm25_term_offsets", offsets),
+        ("bm25_post_rows", rows[order].astype(np.uint32)),
+        ("bm25_post_tf", tfs[order].astype(np.uint16)),
+        ("bm25_doc_len", doc_len.astype(np.uint32)),
+    ]
+
+
+def _texts(index, keep=None):
+    # (offsets, blob) of the kept rows, copied as raw utf-8 bytes
+    offsets = index.section("offsets", np.uint64).astype(np.int64)
+    blob = index.section("texts", np.uint8)
+    lengths = np.diff(offsets)
+    if keep is not None:
+        blob = blob[np.repeat(keep, lengths)]
+        lengths = lengths[keep]
+    return lengths, blob
+
+
+def _vectors(index, dtype, rows=slice(None)):
+    # Raw rows when the encoding matches, otherwise decoded and re-encoded
+    if index.header["dtype"] == dtype:
+        sections = [("vectors", np.asarray(index.vectors[rows]))]
+        if index.scales is not None:
+            sections.append(("scales", np.asarray(index.scales[rows])))
+        return sections
+    return quantise(index.dense(rows), dtype)
+
+
+def _splice(base, path, add_name, add_index, dropped):
+    # Copies the kept rows' encoded vectors, texts and BM25 postings and
+    # appends the added document's; nothing is re-tokenised or re-embedded.
+    dtype = base.header["dtype"] if base is not None else INDEX_DTYPE
+    dim = (base if base is not None else add_index).dim
+    documents = [] if base is None else [n for n in base.documents if n not in dropped]
+    if add_index is not None and add_index.count:
+        documents.append(add_name)
+    slots = {name: slot for slot, name in enumerate(documents)}
+
+    vectors, lengths, blobs, pages, doc_ids, doc_len, postings = ([] for _ in range(7))
+    kept = 0
+    if base is not None and base.count:
+        remap = np.array(
+            [-1 if name in dropped else slots[name] for name in base.documents],
+            np.int32,
+        )
+        keep = remap[base.doc_ids] >= 0
+        kept = int(keep.sum())
+        vectors.append(_vectors(base, dtype, np.flatnonzero(keep)))
+        base_lengths, blob = _texts(base, keep)
+        lengths.append(base_lengths)
+        blobs.append(blob)
+        pages.append(base.pages[keep])
+        doc_ids.append(remap[base.doc_ids[keep]])
+        doc_len.append(base.section("bm25_doc_len", np.uint32)[keep])
+        postings.append(_postings(base, keep))
+    if add_index is not None and add_index.count:
+        vectors.append(_vectors(add_index, dtype))
+        add_lengths, blob = _texts(add_index)
+        lengths.append(add_lengths)
+        blobs.append(blob)
+        pages.append(np.asarray(add_index.pages))
+        doc_ids.append(np.full(add_index.count, slots[add_name], np.int32))
+        doc_len.append(add_index.section("bm25_doc_len", np.uint32))
+        postings.append(_postings(add_index, row_base=kept))
+
+    def joined(arrays, dtype):
+        return np.concatenate([np.zeros(0, dtype), *arrays]).astype(dtype)
+
+    count = kept + (add_index.count if add_index is not None else 0)
+    if vectors:
+        names = [name for name, _ in vectors[0]]
+        sections = [
+            (name, np.concatenate([dict(part)[name] for part in vectors]))
+            for name in names
+        ]
+    else:
+        sections = quantise(np.zeros((0, dim), np.float32), dtype)
+    offsets = np.zeros(count + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum(joined(lengths, np.int64))
+    sections += [
+        ("pages", joined(pages, np.int32)),
+        ("doc_ids", joined(doc_ids, np.int32)),
+        ("offsets", offsets),
+        ("texts", joined(blobs, np.uint8)),
+    ]
+    sections += _merge_postings(postings, joined(doc_len, np.uint32))
+    return write_sections(path, count, dim, dtype, sections, {"documents": documents})
+
+
+def merge(base, path, add_name=None, add_index=None, remove_name=None):
+    dropped = {add_name, remove_name}
+    inputs = [index for index in (base, add_index) if index is not None]
+    if inputs and all(index.has_section("bm25_vocab") for index in inputs) and (
+        base is None or base.doc_ids is not None
+    ):
+        return _splice(base, path, add_name, add_index, dropped)
+    return _rebuild(base, path, add_name, add_index, dropped)
+
+
+def update_library(
+    s3, bucket, user_id, add_name=None, add_path=None, remove_name=None
+):
+    # Optimistic concurrency: rebuild from the current library and write it
+    # back only if nobody else replaced it in the meantime.
+    key = library_key(user_id)
+    add_index = VectorIndex(add_path) if add_path else None
+    path = f"/tmp/library-{user_id}-{threading.get_ident()}.vec"
+
+    try:
+        for attempt in range(UPDATE_ATTEMPTS):
+            if attempt:
+                # Full jitter, so concurrent writers do not collide again
+                ceiling = min(BACKOFF_CEILING, BACKOFF_BASE * 2**attempt)
+                time.sleep(random.uniform(0, ceiling))
+            # The ETag must be the one the merged base was read from; the
+            # shared index cache may already hold a newer version.
+            etag, base = fetch_library(s3, bucket, user_id)
+            if add_index is None and (
+                base is None or remove_name not in base.documents
+            ):
+                # Never merged (or already removed): no library to create or rewrite
+                return
+            merge(base, path, add_name, add_index, remove_name)
+            if base is not None:
+                condition = {"IfMatch": etag}
+            else:
+                condition = {"IfNoneMatch": "*"}
+            try:
+                with open(path, "rb") as f:
+                    s3.put_object(Bucket=bucket, Key=key, Body=f, **condition)
+                logger.info(
+                    {
+                        "library_updated": user_id,
+                        "added": add_name,
+                        "removed": remove_name,
+                        "attempt": attempt,
+                    }
+                )
+                return
+            except ClientError as e:
+                if e.response["Error"]["Code"] not in CONFLICT_CODES:
+                    raise
+                forget_s3_index(key)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+    raise LibraryConflict(f"Could not update library index for {user_id}")
+
+
+def defer_library_update(user_id, name):
+    # Retried by the queue worker (generate_embeddings) after DEFER_SECONDS
+    message = {"action": "library", "user": user_id, "name": name}
+    utils.sqs.send_message(
+        QueueUrl=QUEUE, MessageBody=json.dumps(message), DelaySeconds=DEFER_SECONDS
+    )
+    logger.warning({"library_update_deferred": user_id, "name": name})
@@ -1,34 +1,51 @@
 from . import routes
-from .utils import logger
-
-
-
-def lambda_handler(event, context):
-    # Log the raw incoming event
-    logger.info("=== Incoming Event ===")
-    logger.info(event)
-
-    # Extract and normalize path
-    path = (event.get("rawPath") or event.get("path") or "").strip().lower().rstrip("/")
-
-    # Extract HTTP method for both REST API v1 and HTTP API v2 / Lambda URLs
-    method = (
-        event.get("httpMethod")  # REST API v1
-        or event.get("requestContext", {})
-        .get("http", {})
-        .get("method")  # HTTP API v2 / Lambda URL
-        or ""
-    )
-    method = method.strip().upper()
+from .request_log import log_event, log_response
+from .utils import logger, timed
+
+
+def handle(event, context):
+    # The response body may be an iterator (stream_response)
+    records = event.get("Records") or []
+    event_source = records[0].get("eventSource") if records else None
+    if event_source in routes.EVENT_SOURCES:
+        return routes.get_handler(routes.EVENT_SOURCES[event_source])(event)
+
+    timings = {}
+    with timed(timings, "duration_ms"):
+        # Extract and normalize path
+        path = (event.get("rawPath") or event.get("path") or "").strip()
+        path = path.lower().rstrip("/")
+
+        # Extract HTTP method for both REST API v1 and HTTP API v2 / Lambda URLs
+        method = (
+            event.get("httpMethod")  # REST API v1
+            or event.get("requestContext", {})
+            .get("http", {})
+            .get("method")  # HTTP API v2 / Lambda URL
+            or ""
+        )
+        method = method.strip().upper()
+
+        # Every log line of this request carries these keys
+        logger.append_keys(method=method, path=path)
+        log_event(event)
+
+        response = routes.handle_route(path, method, event, context, timings)
+
+    log_response(event, response, timings)
+    return response
 
-    logger.info(f"Normalized Path: {path}")
-    logger.info(f"Normalized Method: {method}")
 
-    # Call route handler
-    response = routes.handle_route(path, method, event, context)
+# Entry point of the HTTP server behind the Lambda Web Adapter (server.py),
+# which streams iterator bodies to the client as they are produced
+handle_streaming = logger.inject_lambda_context(clear_state=True)(handle)
 
-    # Log the final response
-    logger.info("=== Lambda Response ===")
-    logger.info(response)
 
+@logger.inject_lambda_context(clear_state=True)
+def lambda_handler(event, context):
+    # Plain Lambda runtime entry point: there is no stream, so buffer
+    response = handle(event, context)
+    body = response.get("body")
+    if body is not None and not isinstance(body, (str, bytes)):
+        response = {**response, "body": "".join(body)}
     return response
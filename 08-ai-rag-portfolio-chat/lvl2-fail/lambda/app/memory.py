@@ -0,0 +1,183 @@
+import os
+import time
+from datetime import datetime, timezone
+
+from boto3.dynamodb.conditions import Key
+
+from . import utils
+from .utils import logger
+
+# Memory table layout (hash key SessionId, range key History):
+#   History = "SUMMARY"          rolling LLM summary of compacted turns; its
+#                                "folded" is the key of the last turn in it
+#   History = "MSG#<time_ns>"    one item per question/answer turn
+# "SUMMARY" sorts after every "MSG#" key, so a single descending Query with
+# Limit=WINDOW_TURNS + 1 returns the summary plus the newest turns. Folded
+# turns are kept as the transcript; history() pages through them.
+
+WINDOW_TURNS = int(os.environ.get("MEMORY_WINDOW_TURNS", "6"))
+COMPACT_EVERY = int(os.environ.get("MEMORY_COMPACT_EVERY", "10"))
+HISTORY_PAGE_TURNS = int(os.environ.get("MEMORY_HISTORY_PAGE_TURNS", "50"))
+MAX_HISTORY_PAGE_TURNS = 200
+
+SUMMARY_KEY = "SUMMARY"
+TURN_PREFIX = "MSG#"
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation about a document. "
+    "Keep names, numbers and open questions.\n\n"
+    "Current summary:\n{summary}\n\nNew turns:\n{turns}\n\nUpdated summary:"
+)
+
+
+class ConversationMemory:
+    def __init__(self, session_id, table=None):
+        self.session_id = session_id
+        self.table = table if table is not None else utils.memory_table
+        self.summary = ""
+        self.folded = None
+        self.turns = []
+
+    def load(self):
+        resp = self.table.query(
+            KeyConditionExpression=Key("SessionId").eq(self.session_id),
+            ScanIndexForward=False,
+            Limit=WINDOW_TURNS + 1,
+        )
+        items = resp.get("Items", [])
+        if items and items[0]["History"] == SUMMARY_KEY:
+            self.summary = items[0].get("summary", "")
+            self.folded = items[0].get("folded")
+            items = items[1:]
+        self.turns = list(reversed(items[:WINDOW_TURNS]))
+        return self
+
+    def messages(self):
+        # Only the chat route needs LangChain; history() and the rest stay light
+        from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+        messages = []
+        if self.summary:
+            messages.append(
+                SystemMessage(
+                    content=f"Summary of the earlier conversation: {self.summary}"
+                )
+            )
+        for turn in self.turns:
+            messages.append(HumanMessage(content=turn["human"]))
+            messages.append(AIMessage(content=turn["ai"]))
+        return messages
+
+    def history(self, before=None, limit=HISTORY_PAGE_TURNS):
+        """(messages, cursor) for up to limit turns older than the turn key
+        `before`, oldest first; pass the cursor back for the page before."""
+        if before and not before.startswith(TURN_PREFIX):
+            raise ValueError(f"Invalid history cursor: {before}")
+        query = {
+            "KeyConditionExpression": Key("SessionId").eq(self.session_id)
+            & Key("History").begins_with(TURN_PREFIX),
+            "ScanIndexForward": False,
+            "Limit": max(1, min(int(limit), MAX_HISTORY_PAGE_TURNS)),
+        }
+        if before:
+            query["ExclusiveStartKey"] = {
+                "SessionId": self.session_id,
+                "History": before,
+            }
+        resp = self.table.query(**query)
+
+        history = []
+        for turn in reversed(resp.get("Items", [])):
+            history.append({"type": "human", "content": turn["human"]})
+            history.append({"type": "ai", "content": turn["ai"]})
+        cursor = resp.get("LastEvaluatedKey", {}).get("History")
+        return history, cursor
+
+    def append_turn(self, question, answer):
+        turn = {
+            "SessionId": self.session_id,
+            "History": f"{TURN_PREFIX}{time.time_ns():020d}",
+            "human": question,
+            "ai": answer,
+            "created": datetime.now(timezone.utc).isoformat(),
+        }
+        self.table.put_item(Item=turn)
+        self.turns = (self.turns + [turn])[-WINDOW_TURNS:]
+
+        # Count turns not yet folded into the summary; the counter lives on
+        # the summary item so appends stay a constant number of writes.
+        resp = self.table.update_item(
+            Key={"SessionId": self.session_id, "History": SUMMARY_KEY},
+            UpdateExpression="ADD #p :one",
+            ExpressionAttributeNames={"#p": "pending"},
+            ExpressionAttributeValues={":one": 1},
+            ReturnValues="UPDATED_NEW",
+        )
+        return int(resp["Attributes"]["pending"])
+
+    def needs_compaction(self, pending):
+        return pending >= WINDOW_TURNS + COMPACT_EVERY
+
+    def compact(self, llm):
+        # Fold every turn older than the window into the summary. Turns are
+        # kept; only those after the last folded one are read.
+        query = {
+            "KeyConditionExpression": Key("SessionId").eq(self.session_id)
+            & Key("History").begins_with(TURN_PREFIX),
+            "ScanIndexForward": True,
+        }
+        if self.folded:
+            query["ExclusiveStartKey"] = {
+                "SessionId": self.session_id,
+                "History": self.folded,
+            }
+        resp = self.table.query(**query)
+        turns = resp.get("Items", [])
+        while "LastEvaluatedKey" in resp:
+            query["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+            resp = self.table.query(**query)
+            turns.extend(resp.get("Items", []))
+        old_turns = turns[:-WINDOW_TURNS] if len(turns) > WINDOW_TURNS else []
+        if not old_turns:
+            return
+
+        transcript = "\n".join(
+            f"Human: {turn['human']}\nAI: {turn['ai']}" for turn in old_turns
+        )
+        summary = llm.invoke(
+            SUMMARY_PROMPT.format(summary=self.summary or "(none)", turns=transcript)
+        ).content
+
+        self.table.put_item(
+            Item={
+                "SessionId": self.session_id,
+                "History": SUMMARY_KEY,
+                "summary": summary,
+                "folded": old_turns[-1]["History"],
+                "pending": len(turns) - len(old_turns),
+            }
+        )
+        self.summary = summary
+        self.folded = old_turns[-1]["History"]
+        logger.info(
+            {"memory_compacted": self.session_id, "turns_folded": len(old_turns)}
+        )
+
+
+def delete_conversation(session_id, table=None):
+    table = table if table is not None else utils.memory_table
+    query = {
+        "KeyConditionExpression": Key("SessionId").eq(session_id),
+        "ProjectionExpression": "#s, #h",
+        "ExpressionAttributeNames": {"#s": "SessionId", "#h": "History"},
+    }
+    resp = table.query(**query)
+    items = resp.get("Items", [])
+    while "LastEvaluatedKey" in resp:
+        resp = table.query(**query, ExclusiveStartKey=resp["LastEvaluatedKey"])
+        items.extend(resp.get("Items", []))
+    with table.batch_writer() as batch:
+        for item in items:
+            batch.delete_item(
+                Key={"SessionId": item["SessionId"], "History": item["History"]}
+            )
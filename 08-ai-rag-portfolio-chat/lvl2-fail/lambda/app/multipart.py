@@ -0,0 +1,108 @@
+import base64
+import io
+
+# multipart/form-data parsing over a single decoded buffer. Parts are
+# returned as memoryview slices of that buffer, so no part is ever copied;
+# file parts are uploaded straight from that view.
+
+
+class MemoryViewReader(io.RawIOBase):
+    # Read-only, seekable file object over a memoryview (for PdfReader, boto3)
+    def __init__(self, view):
+        self._view = view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), len(self._view) - self._pos)
+        buffer[:n] = self._view[self._pos : self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, min(offset, len(self._view)))
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+def get_boundary(headers):
+    content_type = headers.get("Content-Type") or headers.get("content-type")
+    if not content_type:
+        raise ValueError("Content-Type header missing")
+
+    params = {}
+    for part in content_type.split(";")[1:]:
+        if "=" in part:
+            key, value = part.strip().split("=", 1)
+            params[key] = value.strip('"')
+
+    if "boundary" not in params:
+        raise ValueError("Missing 'boundary' in Content-Type header")
+    return params["boundary"].encode("utf-8")
+
+
+def decode_body(event):
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded", False):
+        return base64.b64decode(body)
+    return body.encode("utf-8")
+
+
+def iter_parts(body, boundary):
+    # Yields (headers text, content memoryview) for every part, scanning the
+    # buffer once with find() instead of split()-ing it into copies.
+    delimiter = b"--" + boundary
+    view = memoryview(body)
+    pos = body.find(delimiter)
+    while pos != -1:
+        start = pos + len(delimiter)
+        if body[start : start + 2] == b"--":
+            return
+        if body[start : start + 2] == b"\r\n":
+            start += 2
+        header_end = body.find(b"\r\n\r\n", start)
+        if header_end == -1:
+            return
+        content_start = header_end + 4
+        next_pos = body.find(b"\r\n" + delimiter, content_start)
+        if next_pos == -1:
+            return
+        headers = bytes(view[start:header_end]).decode("utf-8")
+        yield headers, view[content_start:next_pos]
+        pos = next_pos + 2
+
+
+def parse_disposition(headers):
+    for header_line in headers.split("\r\n"):
+        if header_line.lower().startswith("content-disposition"):
+            disposition = {}
+            for disp_part in header_line.split(";")[1:]:
+                if "=" in disp_part:
+                    k, v = disp_part.strip().split("=", 1)
+                    disposition[k] = v.strip('"')
+            return disposition
+    return None
+
+
+def upload_view(s3, bucket, key, view, content_type="application/octet-stream"):
+    # One PUT is enough: Function URL request payloads are capped at 6 MB, so
+    # a form upload can never need S3 multipart. Larger files go straight to
+    # S3 through the presigned multipart flow (uploads.py, /upload/multipart).
+    s3.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=MemoryViewReader(view),
+        ContentLength=len(view),
+        ContentType=content_type,
+    )
@@ -0,0 +1,132 @@
+import io
+import time
+
+import pypdf
+from pypdf.generic import IndirectObject
+
+from .multipart import MemoryViewReader
+from .utils import logger
+
+# Page count, size and title of a PDF without downloading it. pypdf's reader
+# is lazy: it follows startxref and the /Prev chain (merging /Info and /Root
+# from older trailers) and only resolves the objects it is asked for. Reads
+# go through a block cache over ranged GETs, so a typical S3 probe is one or
+# two requests. The page count is the root /Pages /Count; the page tree is
+# only walked when that is missing or bogus.
+#
+# strict=True is tried first because strict=False also seeks to every object
+# in the xref to validate it, which touches the whole file. Damaged files get
+# the lenient pass, which reuses the blocks already fetched.
+
+READ_BLOCK = 256 * 1024
+
+
+class RangedReader(io.RawIOBase):
+    # Read-only, seekable file object over ranged reads, caching every window
+    def __init__(self, fetch, size):
+        self.fetch = fetch
+        self.size = size
+        self.windows = []
+        self.requests = 0
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def _read(self, start, end):
+        for window_start, data in self.windows:
+            if window_start <= start and end <= window_start + len(data):
+                return data[start - window_start : end - window_start]
+        # Reads near the end of the file pull the whole tail in one request
+        fetch_start = max(0, min(start, self.size - READ_BLOCK))
+        fetch_end = min(self.size, max(end, fetch_start + READ_BLOCK))
+        data = self.fetch(fetch_start, fetch_end)
+        self.requests += 1
+        self.windows.append((fetch_start, data))
+        return data[start - fetch_start : end - fetch_start]
+
+    def readinto(self, buffer):
+        end = min(self.size, self._pos + len(buffer))
+        if end <= self._pos:
+            return 0
+        data = self._read(self._pos, end)
+        buffer[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self._pos = max(0, min(offset, self.size))
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+def _page_count(reader):
+    pages = reader.trailer["/Root"].get_object().get("/Pages")
+    count = pages.get_object().get("/Count") if pages is not None else None
+    if isinstance(count, IndirectObject):
+        count = count.get_object()
+    if isinstance(count, int) and not isinstance(count, bool) and count >= 0:
+        return int(count)
+    return len(reader.pages)
+
+
+def _read_metadata(stream, size, strict):
+    reader = pypdf.PdfReader(stream, strict=strict)
+    title = None
+    if not reader.is_encrypted:
+        # Decoded per the PDF spec: UTF-16BE, UTF-8 or PDFDocEncoding
+        title = reader.metadata.title if reader.metadata else None
+    title = title.replace("\x00", "").strip() if isinstance(title, str) else None
+    return {"pages": _page_count(reader), "size": size, "title": title or None}
+
+
+def _probe(stream, size, source):
+    started = time.perf_counter()
+    try:
+        metadata = _read_metadata(stream, size, strict=True)
+        method = "strict"
+    except Exception as e:
+        logger.warning({"pdf_probe_fallback": source, "reason": repr(e)})
+        stream.seek(0)
+        metadata = _read_metadata(stream, size, strict=False)
+        method = "lenient"
+
+    logger.info(
+        {
+            "pdf_probe": method,
+            "source": source,
+            "pages": metadata["pages"],
+            "size": metadata["size"],
+            "reads": getattr(stream, "requests", None),
+            "probe_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+    )
+    return metadata
+
+
+def probe_s3_pdf(s3, bucket, key, size=None):
+    """Return {"pages", "size", "title"} for a PDF in S3 using ranged GETs."""
+    if size is None:
+        size = s3.head_object(Bucket=bucket, Key=key)["ContentLength"]
+
+    def fetch(start, end):
+        byte_range = f"bytes={start}-{end - 1}"
+        return s3.get_object(Bucket=bucket, Key=key, Range=byte_range)["Body"].read()
+
+    stream = RangedReader(fetch, int(size))
+    return _probe(stream, int(size), f"s3://{bucket}/{key}")
+
+
+def probe_pdf_buffer(view):
+    """Same as probe_s3_pdf for a PDF already held in memory."""
+    view = memoryview(view)
+    return _probe(MemoryViewReader(view), len(view), "buffer")
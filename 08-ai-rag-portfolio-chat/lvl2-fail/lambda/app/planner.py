@@ -0,0 +1,64 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from .utils import timed
+
+# Decides how to turn a chat turn into a retrieval query:
+#   raw         no history, or the question reads as self-contained:
+#               retrieve with the question as typed, no rewrite LLM call
+#   rewritten / raw-over-rewrite
+#               otherwise the rewrite LLM call and the raw-query retrieval run
+#               concurrently, the rewritten question is retrieved as soon as
+#               it arrives, and the result set with the higher mean dense
+#               similarity wins
+
+MIN_SELF_CONTAINED_WORDS = 5
+REFERENCE_WORDS = set(
+    "it its this that these those they them their he she him her his hers "
+    "above previous earlier former latter same else more another again also "
+    "there then one ones".split()
+)
+FOLLOW_UP_OPENERS = ("and ", "but ", "so ", "what about", "how about", "why")
+WORD_RE = re.compile(r"[a-z']+")
+
+
+def is_self_contained(question):
+    text = question.strip().lower()
+    words = WORD_RE.findall(text)
+    if len(words) < MIN_SELF_CONTAINED_WORDS or text.startswith(FOLLOW_UP_OPENERS):
+        return False
+    return not REFERENCE_WORDS.intersection(words)
+
+
+def _timed(timings, stage, func, *args):
+    with timed(timings, stage):
+        return func(*args)
+
+
+def _mean_similarity(docs):
+    if not docs:
+        return float("-inf")
+    return sum(doc.metadata.get("similarity", 0.0) for doc in docs) / len(docs)
+
+
+def plan_retrieval(question, chat_history, retrieve, rewrite, timings):
+    """Return (documents, query used, strategy) for one chat turn.
+
+    retrieve(query) -> [Document] and rewrite(question, chat_history) -> str
+    are supplied by the caller; per-stage milliseconds are added to timings.
+    """
+    if not chat_history or is_self_contained(question):
+        docs = _timed(timings, "retrieve_raw_ms", retrieve, question)
+        return docs, question, "raw"
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        raw = pool.submit(_timed, timings, "retrieve_raw_ms", retrieve, question)
+        standalone = _timed(timings, "rewrite_ms", rewrite, question, chat_history)
+        rewritten_docs = _timed(
+            timings, "retrieve_rewritten_ms", retrieve, standalone
+        )
+        raw_docs = raw.result()
+
+    if _mean_similarity(raw_docs) > _mean_similarity(rewritten_docs):
+        return raw_docs, question, "raw-over-rewrite"
+    return rewritten_docs, standalone, "rewritten"
@@ -0,0 +1,125 @@
+from functools import cache
+
+import boto3
+from botocore.config import Config
+import numpy as np
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_aws.embeddings import BedrockEmbeddings
+from langchain_aws.chat_models import ChatBedrock
+
+from .hybrid import hybrid_search
+from .utils import EAST_REGION, EMBEDDING_MODEL_ID, MODEL_ID
+
+# Everything below is built once per container on first use and shared by all
+# warm invocations. Retrieval is planned per request (planner.py) and the
+# retrieved documents are handed to the answer chain as "context".
+
+BEDROCK_CONFIG = Config(
+    max_pool_connections=10,
+    tcp_keepalive=True,
+    retries={"max_attempts": 4, "mode": "adaptive"},
+)
+
+_cold = {"start": True}
+
+
+def is_cold_start():
+    cold = _cold["start"]
+    _cold["start"] = False
+    return cold
+
+
+@cache
+def get_bedrock_runtime():
+    return boto3.client("bedrock-runtime", config=BEDROCK_CONFIG)
+
+
+@cache
+def get_embeddings():
+    return BedrockEmbeddings(
+        model_id=EMBEDDING_MODEL_ID,
+        client=get_bedrock_runtime(),
+        region_name=EAST_REGION,
+    )
+
+
+@cache
+def get_contextualize_llm():
+    return ChatBedrock(
+        model_id=MODEL_ID,
+        client=get_bedrock_runtime(),
+        model_kwargs={"temperature": 0.0},
+    )
+
+
+@cache
+def get_qa_llm():
+    return ChatBedrock(model_id=MODEL_ID, client=get_bedrock_runtime())
+
+
+@cache
+def get_contextualize_prompt():
+    # Prompt to convert follow-up questions into standalone queries
+    return ChatPromptTemplate.from_messages(
+        [
+            ("system", "Make the follow-up question standalone based on chat history."),
+            MessagesPlaceholder(variable_name="chat_history"),
+            ("human", "{input}"),
+        ]
+    )
+
+
+@cache
+def get_qa_prompt():
+    # Prompt for answering using context + history
+    return ChatPromptTemplate.from_messages(
+        [
+            ("system", "Answer using only the retrieved context."),
+            MessagesPlaceholder(variable_name="chat_history"),
+            ("human", "{input}"),
+        ]
+    )
+
+
+@cache
+def get_rewrite_chain():
+    return get_contextualize_prompt() | get_contextualize_llm() | StrOutputParser()
+
+
+@cache
+def get_answer_chain():
+    return create_stuff_documents_chain(get_qa_llm(), get_qa_prompt())
+
+
+def index_retriever(index, k=4, documents=None, query_vectors=None):
+    # query_vectors: {query text: embedding}, reused and filled in so callers
+    # can see the vectors behind each query
+    embeddings = get_embeddings()
+    query_vectors = {} if query_vectors is None else query_vectors
+
+    def retrieve(query):
+        vector = query_vectors.get(query)
+        if vector is None:
+            vector = query_vectors[query] = embeddings.embed_query(query)
+        hits = hybrid_search(index, query, vector, k, documents=documents)
+        rows = [i for i, _ in hits]
+        unit = np.asarray(vector, dtype=np.float32)
+        unit = unit / max(float(np.linalg.norm(unit)), 1e-12)
+        similarity = index.dense(rows) @ unit if rows else []
+        return [
+            Document(
+                page_content=index.text(i),
+                metadata={
+                    "source": index.source(i),
+                    "page": index.page(i),
+                    "score": score,
+                    "similarity": float(sim),
+                },
+            )
+            for (i, score), sim in zip(hits, similarity)
+        ]
+
+    return retrieve
@@ -0,0 +1,103 @@
+import json
+
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+
+from . import utils
+from .documents import invalidate as invalidate_listing
+from .utils import BUCKET, QUEUE, logger
+
+# Documents ingested before index.vec existed only have the pickled FAISS
+# artifacts (index.faiss / index.pkl) next to their PDF. They are READY but
+# unreadable by chat, so they are re-queued for ingestion:
+#   - on demand, when chat finds no index.vec for a READY document
+#   - in bulk with `python -m app.reindex` (scans the document table once)
+# The READY -> PROCESSING update is conditional, so a document is only ever
+# queued once however many requests notice it.
+
+LEGACY_INDEX = "index.faiss"
+
+
+def _exists(key):
+    try:
+        utils.s3.head_object(Bucket=BUCKET, Key=key)
+        return True
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+
+
+def needs_reindex(user_id, file_name):
+    prefix = f"{user_id}/{file_name}/"
+    return not _exists(f"{prefix}index.vec") and _exists(f"{prefix}{LEGACY_INDEX}")
+
+
+def source_key(user_id, file_name):
+    # upload_trigger stores {user}/{name}/{name}; manual_upload uploads/{name}
+    for key in (f"{user_id}/{file_name}/{file_name}", f"uploads/{file_name}"):
+        if _exists(key):
+            return key
+    return None
+
+
+def request_reindex(document):
+    user_id, file_name = document["userid"], document["filename"]
+    key = source_key(user_id, file_name)
+    if key is None:
+        logger.warning({"reindex_skipped": file_name, "user": user_id})
+        return False
+    try:
+        utils.document_table.update_item(
+            Key={"userid": user_id, "documentid": document["documentid"]},
+            UpdateExpression="SET docstatus = :processing",
+            ConditionExpression="docstatus = :ready",
+            ExpressionAttributeValues={":processing": "PROCESSING", ":ready": "READY"},
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return False  # already queued by someone else
+        raise
+    message = {"documentid": document["documentid"], "key": key, "user": user_id}
+    utils.sqs.send_message(QueueUrl=QUEUE, MessageBody=json.dumps(message))
+    invalidate_listing(user_id)
+    logger.info({"reindex_queued": file_name, "user": user_id})
+    return True
+
+
+def reindex_document(user_id, file_name):
+    """Queue a legacy document for re-ingestion; True when one was queued."""
+    if not needs_reindex(user_id, file_name):
+        return False
+    query = {
+        "KeyConditionExpression": Key("userid").eq(user_id),
+        "FilterExpression": Attr("filename").eq(file_name)
+        & Attr("docstatus").eq("READY"),
+    }
+    queued = False
+    while True:
+        resp = utils.document_table.query(**query)
+        for document in resp.get("Items", []):
+            queued = request_reindex(document) or queued
+        if "LastEvaluatedKey" not in resp:
+            return queued
+        query["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def backfill():
+    scan = {"FilterExpression": Attr("docstatus").eq("READY")}
+    queued = 0
+    while True:
+        resp = utils.document_table.scan(**scan)
+        for document in resp.get("Items", []):
+            if needs_reindex(document["userid"], document["filename"]):
+                queued += request_reindex(document)
+        if "LastEvaluatedKey" not in resp:
+            break
+        scan["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+    logger.info({"reindex_backfill": queued})
+    return queued
+
+
+if __name__ == "__main__":
+    backfill()
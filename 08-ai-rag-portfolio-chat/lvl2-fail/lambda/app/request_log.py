@@ -0,0 +1,77 @@
+import logging
+import os
+from typing import Any, Dict
+
+from .utils import logger
+
+# Every HTTP request gets one fixed-size INFO line: status, response size and
+# timings. The request summary is DEBUG, so it is only built and shipped for
+# invocations Powertools samples at DEBUG (POWERTOOLS_LOGGER_SAMPLE_RATE), or
+# when the request fails. Summaries never carry bodies, cap every value at
+# MAX_VALUE_CHARS and redact credentials, so cost does not grow with payload.
+
+MAX_VALUE_CHARS = int(os.environ.get("LOG_MAX_VALUE_CHARS", "200"))
+MAX_ITEMS = 20
+REDACTED = "[redacted]"
+REDACT_KEYS = {
+    "authorization",
+    "cookie",
+    "set-cookie",
+    "x-api-key",
+    "x-amz-security-token",
+    "x-amz-signature",
+    "x-amz-credential",
+    "token",
+    "password",
+}
+
+
+def _cap(value: Any) -> str:
+    text = value if isinstance(value, str) else str(value)
+    if len(text) <= MAX_VALUE_CHARS:
+        return text
+    return f"{text[:MAX_VALUE_CHARS]}...(+{len(text) - MAX_VALUE_CHARS} chars)"
+
+
+def _redact(mapping: Dict[str, Any]) -> Dict[str, str]:
+    summary = {}
+    for i, (key, value) in enumerate((mapping or {}).items()):
+        if i == MAX_ITEMS:
+            summary["..."] = f"+{len(mapping) - MAX_ITEMS} more"
+            break
+        summary[key] = REDACTED if key.lower() in REDACT_KEYS else _cap(value)
+    return summary
+
+
+def summarize_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    http = (event.get("requestContext") or {}).get("http") or {}
+    return {
+        "query": _redact(event.get("queryStringParameters")),
+        "pathParameters": _redact(event.get("pathParameters")),
+        "headers": _redact(event.get("headers")),
+        "body_bytes": len(event.get("body") or ""),
+        "base64": bool(event.get("isBase64Encoded")),
+        "source_ip": http.get("sourceIp"),
+    }
+
+
+def log_event(event: Dict[str, Any]) -> None:
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug({"event": summarize_event(event)})
+
+
+def log_response(
+    event: Dict[str, Any], response: Dict[str, Any], timings: Dict[str, float]
+) -> None:
+    status = response.get("statusCode", 200)
+    body = response.get("body") or ""
+    fields = {
+        "status": status,
+        # Streamed bodies are still being produced; their size is unknown
+        "response_bytes": len(body) if isinstance(body, (str, bytes)) else None,
+        **timings,
+    }
+    if status >= 500:
+        logger.error({"request": fields, "event": summarize_event(event)})
+    else:
+        logger.info({"request": fields})
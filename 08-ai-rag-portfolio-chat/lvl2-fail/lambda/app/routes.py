@@ -1,54 +1,113 @@
-from typing import Dict, Any
-from .handlers import (
-    add_conversation,
-    generate_presigned_url,
-    generate_response,
-    get_document,
-    manual_upload,
-    get_document,
-    get_all_documents,
-)
-
-import logging
-
-logging.basicConfig(level=logging.INFO)
-
-
-def handle_route(path, method, event, context):
-    logging.info(f"Incoming request - Method: {method}, Path: {path}, Event: {event}")
-
-    if path == "/document" and method == "GET":
-        logging.info("Matched route: GET /document")
-        return get_document.handler(event)
-
-    elif path == "/conversation" and method == "    ":
-        logging.info("Matched route: POST /conversation")
-        return add_conversation.handler(event)
-
-    elif path == "/upload" and method == "POST":
-        logging.info("Matched route: POST /upload")
-        return manual_upload.handler(event)
-
-    elif path == "/presign-url" and method == "GET":
-        logging.info("Matched route: GET /presign-url")
-        return generate_presigned_url.handler(event)
-
-    elif path.startswith("/chat/") and method == "POST":
-        conversation_id = path.split("/chat/")[1]
-        logging.info(f"Matched route: POST /chat/{conversation_id}")
-        event["pathParameters"] = {"conversationid": conversation_id}
-        return generate_response.handler(event)
-
-    elif path.startswith("/doc") and method == "GET":
-        parts = path.split("/doc/")
-        doc_id = parts[1] if len(parts) > 1 else None
-        if doc_id == "all" or not doc_id:
-            logging.info("Matched route: GET /doc/all")
-            return get_all_documents.handler(event)
-        else:
-            logging.info(f"Matched route: GET /doc/{doc_id}")
-            return get_document.handler(event)
-
-    else:
-        logging.warning(f"No matching route found for {method} {path}")
+from importlib import import_module
+
+from .utils import logger, timed
+
+# (method, path) -> "handler module", or "module:function" for modules that
+# serve several routes. Static paths dispatch with one dict lookup; paths with
+# {params} are compiled into a segment trie. Handler modules are imported on
+# first hit, so a route only loads what it needs.
+ROUTES = [
+    ("GET", "/document", "get_document"),
+    ("POST", "/conversation", "add_conversation"),
+    ("POST", "/conversation/{documentid}", "add_conversation"),
+    ("POST", "/upload", "manual_upload"),
+    ("GET", "/presign-url", "generate_presigned_url"),
+    ("POST", "/upload/multipart", "multipart_upload:initiate"),
+    ("POST", "/upload/multipart/{uploadid}/parts", "multipart_upload:sign_parts"),
+    ("POST", "/upload/multipart/{uploadid}/complete", "multipart_upload:complete"),
+    ("DELETE", "/upload/multipart/{uploadid}", "multipart_upload:abort"),
+    ("POST", "/chat/{conversationid}", "generate_response"),
+    ("GET", "/doc", "get_all_documents"),
+    ("GET", "/doc/all", "get_all_documents"),
+    ("GET", "/doc/{documentid}", "get_document"),
+    ("GET", "/doc/{documentid}/{conversationid}", "get_document"),
+    ("DELETE", "/doc/{documentid}", "delete_document"),
+]
+
+# Queue and bucket notifications share the function with the HTTP API
+EVENT_SOURCES = {
+    "aws:sqs": "generate_embeddings",
+    "aws:s3": "upload_trigger",
+}
+
+
+class _Node:
+    __slots__ = ("children", "param", "param_name", "targets")
+
+    def __init__(self):
+        self.children = {}
+        self.param = None
+        self.param_name = None
+        self.targets = {}
+
+
+class Router:
+    def __init__(self, routes=()):
+        self.static = {}
+        self.root = _Node()
+        for method, path, target in routes:
+            self.add(method, path, target)
+
+    def add(self, method, path, target):
+        if "{" not in path:
+            self.static[(method, path.lower())] = target
+            return
+        node = self.root
+        for segment in path.strip("/").split("/"):
+            if segment.startswith("{") and segment.endswith("}"):
+                node.param = node.param or _Node()
+                node.param_name = segment[1:-1]
+                node = node.param
+            else:
+                node = node.children.setdefault(segment.lower(), _Node())
+        node.targets[method] = target
+
+    def match(self, method, path):
+        # Static segments match case-insensitively; parameter values keep
+        # their original case (conversation and document ids are mixed-case).
+        path = path.rstrip("/") or "/"
+        target = self.static.get((method, path.lower()))
+        if target:
+            return target, {}
+
+        node, params = self.root, {}
+        for segment in path.strip("/").split("/"):
+            child = node.children.get(segment.lower())
+            if child is None and node.param is not None and segment:
+                params[node.param_name] = segment
+                child = node.param
+            if child is None:
+                return None, None
+            node = child
+        target = node.targets.get(method)
+        return (target, params) if target else (None, None)
+
+
+router = Router(ROUTES)
+_handlers = {}
+
+
+def get_handler(name):
+    if name not in _handlers:
+        module, _, function = name.partition(":")
+        handlers = import_module(f".handlers.{module}", __package__)
+        _handlers[name] = getattr(handlers, function or "handler")
+    return _handlers[name]
+
+
+def handle_route(path, method, event, context, timings=None):
+    timings = {} if timings is None else timings
+    raw_path = (event.get("rawPath") or event.get("path") or path).strip()
+    target, params = router.match(method, raw_path)
+    if target is None:
+        logger.warning("No matching route found for %s %s", method, path)
         return {"statusCode": 404, "body": f"Route not found: {method} {path}"}
+
+    logger.append_keys(route=target)
+    if params:
+        event["pathParameters"] = {**(event.get("pathParameters") or {}), **params}
+    # load_ms is only non-zero when this request imported the handler
+    with timed(timings, "load_ms"):
+        handler = get_handler(target)
+    with timed(timings, "handler_ms"):
+        return handler(event)
@@ -0,0 +1,151 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+from .hybrid import bm25_sections
+from .utils import logger
+from .vector_index import VectorIndex, forget_s3_index, open_s3_index, write_index
+
+# Partial availability while a document is still being ingested. Every
+# SEGMENT_PAGES pages generate_embeddings publishes the chunks embedded since
+# the previous segment as {user}/{name}/segments/NNNNN.vec and records
+# indexed_pages / segments on the document row. Until the final index.vec
+# exists, chat merges the published segments into one local index; once the
+# document is READY the segments are deleted.
+
+SEGMENT_PAGES = int(os.environ.get("INGEST_SEGMENT_PAGES", "25"))
+
+# prefix -> ((key, ETag) of every segment, merged VectorIndex, partial info)
+_merged = {}
+_merge_lock = threading.Lock()
+
+
+def _missing(error):
+    return error.response["Error"]["Code"] in ("NoSuchKey", "404")
+
+
+def segment_prefix(document_prefix):
+    return f"{document_prefix}segments/"
+
+
+def publish_segment(
+    s3, bucket, document_prefix, number, vectors, texts, pages, work_dir, metadata
+):
+    path = f"{work_dir}/segment-{number:05d}.vec"
+    write_index(
+        path,
+        vectors,
+        texts,
+        pages=pages,
+        metadata=metadata,
+        extra_sections=bm25_sections(texts),
+    )
+    s3.upload_file(path, bucket, f"{segment_prefix(document_prefix)}{number:05d}.vec")
+    os.remove(path)
+
+
+def _partial_path(document_prefix):
+    digest = hashlib.sha1(document_prefix.encode("utf-8")).hexdigest()
+    return f"/tmp/{digest}-partial.vec"
+
+
+def forget_segments(document_prefix, keys=()):
+    # Drops the cached segment indexes and merged partial index with their files
+    for key in keys:
+        forget_s3_index(key)
+    if _merged.pop(document_prefix, None) is not None:
+        try:
+            os.remove(_partial_path(document_prefix))
+        except FileNotFoundError:
+            pass
+
+
+def delete_segments(s3, bucket, document_prefix):
+    paginator = s3.get_paginator("list_objects_v2")
+    prefix = segment_prefix(document_prefix)
+    deleted = []
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        keys = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+        if keys:
+            s3.delete_objects(Bucket=bucket, Delete={"Objects": keys, "Quiet": True})
+            deleted.extend(key["Key"] for key in keys)
+    forget_segments(document_prefix, deleted)
+
+
+def _list_segments(s3, bucket, document_prefix):
+    resp = s3.list_objects_v2(Bucket=bucket, Prefix=segment_prefix(document_prefix))
+    return tuple(
+        sorted((obj["Key"], obj["ETag"]) for obj in resp.get("Contents", []))
+    )
+
+
+def _merge(path, indexes):
+    vectors = [index.dense() for index in indexes if index.count]
+    texts, pages = [], []
+    for index in indexes:
+        texts.extend(index.text(i) for i in range(index.count))
+        pages.extend(index.page(i) for i in range(index.count))
+    dim = vectors[0].shape[1] if vectors else 0
+    write_index(
+        path,
+        np.concatenate(vectors) if vectors else np.zeros((0, dim), np.float32),
+        texts,
+        pages=pages,
+        metadata={"source": indexes[-1].metadata.get("source")},
+        extra_sections=bm25_sections(texts),
+    )
+    return VectorIndex(path)
+
+
+def open_segments(s3, bucket, document_prefix):
+    """Merged index of the published segments plus progress, or None."""
+    listing = _list_segments(s3, bucket, document_prefix)
+    if not listing:
+        return None
+    cached = _merged.get(document_prefix)
+    if cached and cached[0] == listing:
+        return cached[1], cached[2]
+
+    with _merge_lock:
+        try:
+            indexes = [open_s3_index(s3, bucket, key) for key, _ in listing]
+        except ClientError as e:
+            # Deleted under us: ingestion finished and index.vec is in place
+            if _missing(e):
+                return None
+            raise
+        index = _merge(_partial_path(document_prefix), indexes)
+
+    last = indexes[-1].metadata
+    partial = {
+        "indexed_pages": last.get("indexed_pages"),
+        "pages": last.get("pages"),
+        "segments": len(listing),
+    }
+    _merged[document_prefix] = (listing, index, partial)
+    logger.info(
+        {"segments_merged": document_prefix, **partial, "chunks": index.count}
+    )
+    return index, partial
+
+
+def open_document_index(s3, bucket, document_prefix):
+    """(index, partial) for a document: the final index.vec with partial None,
+    the merged segments while ingestion is running, or (None, None)."""
+    for _ in range(2):
+        try:
+            index = open_s3_index(s3, bucket, f"{document_prefix}index.vec")
+            merged = _merged.get(document_prefix)
+            if merged:
+                forget_segments(document_prefix, [key for key, _ in merged[0]])
+            return index, None
+        except ClientError as e:
+            if not _missing(e):
+                raise
+        opened = open_segments(s3, bucket, document_prefix)
+        if opened is not None:
+            return opened
+    return None, None
@@ -0,0 +1,155 @@
+import base64
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qsl, urlsplit
+
+from . import main
+from .utils import logger
+
+# HTTP front for the Lambda Web Adapter (AWS_LWA_INVOKE_MODE=response_stream).
+# The adapter turns each Function URL request into a plain HTTP request; it
+# is converted back into the usual Function URL event and handed to
+# main.handle_streaming. Iterator bodies (stream_response) are written with
+# chunked encoding line by line, so the client sees tokens as Bedrock
+# produces them. SQS and S3 events arrive as POSTs to PASS_THROUGH_PATH with
+# the raw event as body and go through main.lambda_handler unchanged.
+
+PORT = int(os.environ.get("AWS_LWA_PORT", os.environ.get("PORT", "8080")))
+PASS_THROUGH_PATH = os.environ.get("AWS_LWA_PASS_THROUGH_PATH", "/events")
+READINESS_PATH = os.environ.get("AWS_LWA_READINESS_CHECK_PATH", "/health")
+TEXT_TYPES = ("application/json", "text/", "application/x-www-form-urlencoded")
+
+
+def lambda_context(headers):
+    # The adapter forwards the invocation's context as a JSON header
+    context = json.loads(headers.get("x-amzn-lambda-context") or "{}")
+    return SimpleNamespace(
+        function_name=os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "local"),
+        function_version=os.environ.get("AWS_LAMBDA_FUNCTION_VERSION", "$LATEST"),
+        memory_limit_in_mb=os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", "0"),
+        invoked_function_arn=context.get("invoked_function_arn", ""),
+        aws_request_id=context.get("request_id", ""),
+    )
+
+
+def build_event(method, target, headers, body, client_ip):
+    url = urlsplit(target)
+    request_context = json.loads(headers.get("x-amzn-request-context") or "{}")
+    http = request_context.setdefault("http", {})
+    http.setdefault("method", method)
+    http.setdefault("path", url.path)
+    http.setdefault("sourceIp", client_ip)
+
+    query = {}
+    for key, value in parse_qsl(url.query, keep_blank_values=True):
+        # Function URLs join repeated parameters with commas
+        query[key] = f"{query[key]},{value}" if key in query else value
+
+    event = {
+        "version": "2.0",
+        "rawPath": url.path,
+        "rawQueryString": url.query,
+        "headers": headers,
+        "queryStringParameters": query or None,
+        "requestContext": request_context,
+        "isBase64Encoded": False,
+    }
+    if body:
+        content_type = headers.get("content-type", "")
+        if content_type.startswith(TEXT_TYPES):
+            event["body"] = body.decode("utf-8", errors="replace")
+        else:
+            event["body"] = base64.b64encode(body).decode("ascii")
+            event["isBase64Encoded"] = True
+    return event
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Requests are logged by main/request_log already
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, response):
+        status = int(response.get("statusCode", 200))
+        body = response.get("body")
+        headers = response.get("headers") or {}
+        self.send_response(status)
+        for name, value in headers.items():
+            if name.lower() not in ("content-length", "transfer-encoding"):
+                self.send_header(name, value)
+
+        if body is None or isinstance(body, (str, bytes)):
+            if response.get("isBase64Encoded") and body:
+                data = base64.b64decode(body)
+            else:
+                data = body.encode("utf-8") if isinstance(body, str) else body or b""
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for piece in body:
+                self._write_chunk(piece)
+        except ConnectionError:
+            # The client went away; stop producing (and paying for) the answer
+            logger.warning("Client disconnected during streamed response")
+            getattr(body, "close", lambda: None)()
+            self.close_connection = True
+            return
+        except Exception:
+            # Headers are gone already: report the failure in the stream itself
+            logger.exception("Streamed response failed")
+            error = {"type": "error", "error": "Internal error"}
+            self._write_chunk(json.dumps(error) + "\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, piece):
+        data = piece.encode("utf-8") if isinstance(piece, str) else piece
+        if data:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+    def _handle(self):
+        headers = {name.lower(): value for name, value in self.headers.items()}
+        body = self._read_body()
+        path = urlsplit(self.path).path
+
+        if path == READINESS_PATH:
+            self._send({"statusCode": 200, "body": "ok"})
+            return
+        context = lambda_context(headers)
+        try:
+            if path == PASS_THROUGH_PATH and self.command == "POST":
+                result = main.lambda_handler(json.loads(body or b"{}"), context)
+                response = {"statusCode": 200, "body": json.dumps(result, default=str)}
+            else:
+                event = build_event(
+                    self.command, self.path, headers, body, self.client_address[0]
+                )
+                response = main.handle_streaming(event, context)
+        except Exception:
+            logger.exception("Unhandled error")
+            body = json.dumps({"error": "Internal error"})
+            response = {"statusCode": 500, "body": body}
+        self._send(response)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_PATCH = do_OPTIONS = _handle
+
+
+def serve():
+    ThreadingHTTPServer(("0.0.0.0", PORT), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    serve()
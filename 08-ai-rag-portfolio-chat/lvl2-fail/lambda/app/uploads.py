@@ -0,0 +1,153 @@
+import math
+import os
+from functools import cache
+
+import boto3
+import shortuuid
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from .utils import BUCKET, SOUTH_REGION, logger
+
+# Browser uploads go straight to S3 with presigned URLs, either one PUT or an
+# S3 multipart upload whose parts the client sends in parallel and can retry
+# or resume individually (list_parts tells it what already arrived).
+#
+# Every upload gets its own key, {user}/{stem}-{token}.pdf/{stem}-{token}.pdf,
+# so there is nothing to HEAD first; completing with If-None-Match: * makes S3
+# refuse the (practically impossible) case of a token collision.
+
+URL_EXPIRES = int(os.environ.get("UPLOAD_URL_EXPIRES", "3600"))
+PART_SIZE = int(os.environ.get("UPLOAD_PART_SIZE", str(16 * 1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(5 * 1024**3)))
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+MAX_SIGNED_PARTS = 1000
+TOKEN_LENGTH = 10
+
+
+@cache
+def get_s3():
+    return boto3.client(
+        "s3",
+        endpoint_url=f"https://s3.{SOUTH_REGION}.amazonaws.com",
+        config=Config(
+            s3={"addressing_style": "virtual"},
+            region_name=SOUTH_REGION,
+            signature_version="s3v4",
+        ),
+    )
+
+
+def upload_key(user_id, file_name):
+    stem = file_name.split(".pdf")[0].replace("/", "_") or "document"
+    name = f"{stem}-{shortuuid.ShortUUID().random(length=TOKEN_LENGTH)}.pdf"
+    return f"{user_id}/{name}/{name}"
+
+
+def check_owner(user_id, key):
+    if not key or not key.startswith(f"{user_id}/") or ".." in key:
+        raise PermissionError("Upload does not belong to this user")
+
+
+def presign_put(key):
+    return get_s3().generate_presigned_url(
+        ClientMethod="put_object",
+        Params={"Bucket": BUCKET, "Key": key, "ContentType": "application/pdf"},
+        ExpiresIn=URL_EXPIRES,
+        HttpMethod="PUT",
+    )
+
+
+def part_size_for(size):
+    if size <= 0 or size > MAX_UPLOAD_BYTES:
+        raise ValueError(f"size must be between 1 and {MAX_UPLOAD_BYTES} bytes")
+    part_size = max(PART_SIZE, MIN_PART_SIZE, math.ceil(size / MAX_PARTS))
+    return part_size, math.ceil(size / part_size)
+
+
+def sign_parts(key, upload_id, part_numbers):
+    if len(part_numbers) > MAX_SIGNED_PARTS:
+        raise ValueError(f"At most {MAX_SIGNED_PARTS} parts per request")
+    urls = []
+    for number in part_numbers:
+        if not 1 <= number <= MAX_PARTS:
+            raise ValueError(f"Invalid part number: {number}")
+        url = get_s3().generate_presigned_url(
+            ClientMethod="upload_part",
+            Params={
+                "Bucket": BUCKET,
+                "Key": key,
+                "UploadId": upload_id,
+                "PartNumber": number,
+            },
+            ExpiresIn=URL_EXPIRES,
+            HttpMethod="PUT",
+        )
+        urls.append({"partNumber": number, "url": url})
+    return urls
+
+
+def initiate(user_id, file_name, size):
+    part_size, part_count = part_size_for(size)
+    key = upload_key(user_id, file_name)
+    upload = get_s3().create_multipart_upload(
+        Bucket=BUCKET, Key=key, ContentType="application/pdf"
+    )
+    upload_id = upload["UploadId"]
+    first_parts = range(1, min(part_count, MAX_SIGNED_PARTS) + 1)
+    logger.info({"multipart_initiated": key, "size": size, "parts": part_count})
+    return {
+        "key": key,
+        "uploadId": upload_id,
+        "partSize": part_size,
+        "partCount": part_count,
+        "expiresIn": URL_EXPIRES,
+        "parts": sign_parts(key, upload_id, first_parts),
+    }
+
+
+def uploaded_parts(key, upload_id):
+    parts = []
+    paginator = get_s3().get_paginator("list_parts")
+    for page in paginator.paginate(Bucket=BUCKET, Key=key, UploadId=upload_id):
+        for part in page.get("Parts", []):
+            parts.append(
+                {
+                    "PartNumber": part["PartNumber"],
+                    "ETag": part["ETag"],
+                    "Size": part["Size"],
+                }
+            )
+    return parts
+
+
+def complete(key, upload_id, parts=None):
+    # Without an explicit part list, whatever S3 has received is assembled
+    if not parts:
+        parts = uploaded_parts(key, upload_id)
+    if not parts:
+        raise ValueError("No parts have been uploaded")
+    parts = sorted(
+        ({"PartNumber": int(p["PartNumber"]), "ETag": p["ETag"]} for p in parts),
+        key=lambda p: p["PartNumber"],
+    )
+    try:
+        get_s3().complete_multipart_upload(
+            Bucket=BUCKET,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+            IfNoneMatch="*",
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("PreconditionFailed", "412"):
+            raise FileExistsError(f"{key} already exists") from e
+        raise
+    logger.info({"multipart_completed": key, "parts": len(parts)})
+    return {"key": key, "parts": len(parts)}
+
+
+def abort(key, upload_id):
+    get_s3().abort_multipart_upload(Bucket=BUCKET, Key=key, UploadId=upload_id)
+    logger.info({"multipart_aborted": key})
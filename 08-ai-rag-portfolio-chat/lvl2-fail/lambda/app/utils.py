@@ -1,7 +1,9 @@
 import os, json
-from typing import Dict, Any
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable
 import json
-import boto3
+import threading
 from aws_lambda_powertools import Logger
 
 # ENV's
@@ -11,18 +13,43 @@ MODEL_ID = os.environ["MODEL_ID"]
 MEMORY_TABLE = os.environ["MEMORY_TABLE"]
 DOCUMENT_TABLE = os.environ["DOCUMENT_TABLE"]
 QUEUE = os.environ["QUEUE"]
+EMBEDDING_CACHE_TABLE = os.environ.get("EMBEDDING_CACHE_TABLE")
+ANSWER_CACHE_TABLE = os.environ.get("ANSWER_CACHE_TABLE")
 
 
 SOUTH_REGION = "ap-south-1"
 EAST_REGION = "us-east-1"
 
-ddb = boto3.resource("dynamodb")
-document_table = ddb.Table(DOCUMENT_TABLE)
-memory_table = ddb.Table(MEMORY_TABLE)
-sqs = boto3.client("sqs")
-s3 = boto3.client("s3")
 logger = Logger()
 
+# AWS clients are built on first access (PEP 562 module __getattr__) and then
+# cached as plain module globals, so importing utils costs no client setup and
+# a route only pays for the clients its handler actually imports.
+_CLIENTS = {
+    "ddb": lambda: _boto3().resource("dynamodb"),
+    "document_table": lambda: __getattr__("ddb").Table(DOCUMENT_TABLE),
+    "memory_table": lambda: __getattr__("ddb").Table(MEMORY_TABLE),
+    "sqs": lambda: _boto3().client("sqs"),
+    "s3": lambda: _boto3().client("s3"),
+}
+_clients_lock = threading.RLock()
+
+
+def _boto3():
+    import boto3
+
+    return boto3
+
+
+def __getattr__(name: str) -> Any:
+    factory = _CLIENTS.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _clients_lock:
+        if name not in globals():
+            globals()[name] = factory()
+    return globals()[name]
+
 
 def response(body: Any, status_code: int = 200) -> Dict[str, Any]:
     return {
@@ -37,8 +64,24 @@ def response(body: Any, status_code: int = 200) -> Dict[str, Any]:
     }
 
 
+def stream_response(events: Iterable[Any], status_code: int = 200) -> Dict[str, Any]:
+    # Newline-delimited JSON, one event per line. The body is a lazy iterator:
+    # server.py writes each line as it is produced (Lambda response
+    # streaming); main.lambda_handler buffers it for plain invocations.
+    return {
+        "statusCode": status_code,
+        "headers": {
+            "Content-Type": "application/x-ndjson",
+            "Access-Control-Allow-Headers": "*",
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "*",
+        },
+        "body": (json.dumps(event, default=str) + "\n" for event in events),
+    }
+
+
 def get_path_param(event: Dict[str, Any], key: str) -> str:
-    return event.get("pathParameters", {}).get(key, "")
+    return (event.get("pathParameters") or {}).get(key, "")
 
 
 def error_response(message: str, status_code: int = 400) -> Dict[str, Any]:
@@ -60,3 +103,12 @@ def get_user_id(event: Dict[str, Any]) -> str:
         return (
             event.get("requestContext", {}).get("http", {}).get("sourceIp", "anonymous")
         )
+
+
+@contextmanager
+def timed(timings: Dict[str, float], stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = round((time.perf_counter() - start) * 1000, 2)
@@ -0,0 +1,286 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+# On-disk layout of index.vec (all integers little-endian):
+#   8 bytes   magic b"RAGVEC01"
+#   4 bytes   header length H
+#   H bytes   JSON header: count, dim, dtype, metadata and the
+#             (offset, nbytes) of every section relative to the data start
+#   data      64-byte aligned sections:
+#               vectors  count x dim, float32 / float16 / int8
+#               scales   float32 per row (int8 only)
+#               pages    int32 page number per chunk (-1 when unknown)
+#               doc_ids  int32 slot in metadata["documents"] (library only)
+#               offsets  uint64 x (count + 1) into the text blob
+#               texts    utf-8 chunk texts, concatenated
+#               ...      optional extra sections, e.g. BM25 postings (hybrid.py)
+# Vectors are L2-normalised at write time, so dot product == cosine.
+
+MAGIC = b"RAGVEC01"
+ALIGN = 64
+INDEX_DTYPE = os.environ.get("INDEX_DTYPE", "float16")
+SEARCH_BLOCK_ROWS = 8192
+MAX_OPEN_INDEXES = int(os.environ.get("INDEX_CACHE_ENTRIES", "32"))
+MAX_OPEN_BYTES = int(os.environ.get("INDEX_CACHE_MB", "256")) * 1024 * 1024
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _normalise(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def quantise(vectors, dtype=INDEX_DTYPE):
+    """The vectors (and int8 scales) sections for L2-normalised vectors."""
+    if dtype == "int8":
+        scales = np.maximum(np.abs(vectors).max(axis=1, initial=0.0) / 127.0, 1e-12)
+        quantised = np.round(vectors / scales[:, None]).astype(np.int8)
+        return [("vectors", quantised), ("scales", scales.astype(np.float32))]
+    if dtype in ("float16", "float32"):
+        return [("vectors", vectors.astype(dtype))]
+    raise ValueError(f"Unsupported index dtype: {dtype}")
+
+
+def write_index(
+    path,
+    vectors,
+    texts,
+    pages=None,
+    metadata=None,
+    doc_ids=None,
+    extra_sections=None,
+    dtype=INDEX_DTYPE,
+):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim != 2:
+        vectors = vectors.reshape(len(texts), -1 if texts else 0)
+    vectors = _normalise(vectors)
+    count, dim = vectors.shape
+
+    sections = quantise(vectors, dtype)
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(count + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(chunk) for chunk in encoded], dtype=np.uint64)
+    if pages is None:
+        pages = [-1] * count
+    sections.append(("pages", np.asarray(pages, dtype=np.int32)))
+    if doc_ids is not None:
+        sections.append(("doc_ids", np.asarray(doc_ids, dtype=np.int32)))
+    sections.append(("offsets", offsets))
+    sections.append(("texts", np.frombuffer(b"".join(encoded), dtype=np.uint8)))
+    sections.extend(extra_sections or [])
+    return write_sections(path, count, dim, dtype, sections, metadata)
+
+
+def write_sections(path, count, dim, dtype, sections, metadata=None):
+    """Write already encoded (name, array) sections as an index file."""
+    layout = {}
+    position = 0
+    for name, array in sections:
+        layout[name] = [position, array.nbytes]
+        position = _align(position + array.nbytes)
+
+    header = json.dumps(
+        {
+            "version": 1,
+            "count": count,
+            "dim": dim,
+            "dtype": dtype,
+            "sections": layout,
+            "metadata": metadata or {},
+        }
+    ).encode("utf-8")
+    data_start = _align(len(MAGIC) + 4 + len(header))
+
+    # Write beside the target and rename, so readers that still mmap the old
+    # file keep a valid mapping.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(4, "little"))
+        f.write(header)
+        for name, array in sections:
+            f.seek(data_start + layout[name][0])
+            f.write(array.tobytes())
+        f.truncate(data_start + position)
+    os.replace(tmp_path, path)
+    return path
+
+
+class VectorIndex:
+    def __init__(self, path):
+        self.path = path
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r")
+        if self._mm[: len(MAGIC)].tobytes() != MAGIC:
+            raise ValueError(f"{path} is not a vector index")
+        header_len = int.from_bytes(self._mm[8:12].tobytes(), "little")
+        self.header = json.loads(self._mm[12 : 12 + header_len].tobytes())
+        self._data_start = _align(12 + header_len)
+
+        self.count = self.header["count"]
+        self.dim = self.header["dim"]
+        self.metadata = self.header["metadata"]
+        self.vectors = self.section("vectors", self.header["dtype"]).reshape(
+            self.count, self.dim
+        )
+        self.scales = (
+            self.section("scales", np.float32)
+            if self.has_section("scales")
+            else None
+        )
+        self.pages = self.section("pages", np.int32)
+        self.doc_ids = (
+            self.section("doc_ids", np.int32)
+            if self.has_section("doc_ids")
+            else None
+        )
+        self.documents = self.metadata.get("documents", [])
+        self.offsets = self.section("offsets", np.uint64)
+        self._texts = self.section("texts", np.uint8)
+
+    def has_section(self, name):
+        return name in self.header["sections"]
+
+    def section(self, name, dtype):
+        offset, nbytes = self.header["sections"][name]
+        start = self._data_start + offset
+        return self._mm[start : start + nbytes].view(dtype)
+
+    def __len__(self):
+        return self.count
+
+    def text(self, i):
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self._texts[start:end].tobytes().decode("utf-8")
+
+    def page(self, i):
+        return int(self.pages[i])
+
+    def source(self, i):
+        if self.doc_ids is None:
+            return self.metadata.get("source")
+        return self.documents[self.doc_ids[i]]
+
+    def dense(self, rows=slice(None)):
+        vectors = self.vectors[rows].astype(np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows][:, None]
+        return vectors
+
+    def scores(self, query):
+        query = _normalise(np.asarray(query, dtype=np.float32))
+        scores = np.empty(self.count, dtype=np.float32)
+        # Upcast a block at a time: float16/int8 have no BLAS path, and
+        # converting the whole matrix would defeat the mmap.
+        for start in range(0, self.count, SEARCH_BLOCK_ROWS):
+            block = self.vectors[start : start + SEARCH_BLOCK_ROWS]
+            scores[start : start + len(block)] = block.astype(np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def document_mask(self, documents):
+        # Rows belonging to the given document names, or None for "all rows"
+        if documents is None or self.doc_ids is None:
+            return None
+        slots = [i for i, name in enumerate(self.documents) if name in documents]
+        return np.isin(self.doc_ids, slots)
+
+    def search(self, query, k=4, documents=None):
+        scores = self.scores(query)
+        mask = self.document_mask(documents)
+        if mask is not None:
+            scores[~mask] = -np.inf
+            k = min(k, int(mask.sum()))
+        k = min(k, self.count)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+
+# S3 key -> (ETag, VectorIndex); survives across warm invocations. Least
+# recently used first; evicted entries have their /tmp copy removed (open
+# memmaps stay valid, the file is only unlinked).
+_open_indexes = OrderedDict()
+_open_lock = threading.Lock()
+
+
+def _remove_local(index):
+    try:
+        os.remove(index.path)
+    except FileNotFoundError:
+        pass
+
+
+def _remember(key, etag, index):
+    with _open_lock:
+        # The previous entry's file was already replaced by os.replace
+        _open_indexes.pop(key, None)
+        _open_indexes[key] = (etag, index)
+        total = sum(entry[1]._mm.nbytes for entry in _open_indexes.values())
+        while len(_open_indexes) > 1 and (
+            len(_open_indexes) > MAX_OPEN_INDEXES or total > MAX_OPEN_BYTES
+        ):
+            _, (_, evicted) = _open_indexes.popitem(last=False)
+            total -= evicted._mm.nbytes
+            _remove_local(evicted)
+
+
+def _cached(key):
+    with _open_lock:
+        cached = _open_indexes.get(key)
+        if cached:
+            _open_indexes.move_to_end(key)
+        return cached
+
+
+def fetch_s3_index(s3, bucket, key):
+    """(ETag, VectorIndex) for key; the ETag is the one this index came from."""
+    cached = _cached(key)
+    params = {"Bucket": bucket, "Key": key}
+    if cached:
+        params["IfNoneMatch"] = cached[0]
+    try:
+        obj = s3.get_object(**params)
+    except ClientError as e:
+        if cached and e.response["Error"]["Code"] in ("304", "NotModified"):
+            return cached
+        raise
+
+    local_path = f"/tmp/{hashlib.sha1(key.encode('utf-8')).hexdigest()}.vec"
+    download_path = f"{local_path}.{threading.get_ident()}.download"
+    with open(download_path, "wb") as f:
+        shutil.copyfileobj(obj["Body"], f, 1 << 20)
+    os.replace(download_path, local_path)
+
+    index = VectorIndex(local_path)
+    _remember(key, obj["ETag"], index)
+    return obj["ETag"], index
+
+
+def open_s3_index(s3, bucket, key):
+    return fetch_s3_index(s3, bucket, key)[1]
+
+
+def s3_index_etag(key):
+    cached = _open_indexes.get(key)
+    return cached[0] if cached else None
+
+
+def forget_s3_index(key):
+    with _open_lock:
+        cached = _open_indexes.pop(key, None)
+    if cached:
+        _remove_local(cached[1])
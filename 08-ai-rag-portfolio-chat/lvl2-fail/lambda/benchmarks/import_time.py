@@ -0,0 +1,146 @@
+"""Cold-start import profile of the Lambda package, one fresh interpreter per handler.
+
+Each handler is loaded the way a cold container loads it (app.main, then the
+handler through routes.get_handler) under `python -X importtime`. The report
+lists wall time per handler, including AWS client construction, and the
+slowest top-level packages by self import time (interpreter startup included).
+
+    python benchmarks/import_time.py                     # every handler
+    python benchmarks/import_time.py get_all_documents --budget 150
+    python benchmarks/import_time.py --output benchmarks/import_time.md
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+LAMBDA_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# app.utils reads these at import; only their presence matters here
+DUMMY_ENV = {
+    "BUCKET": "bench-bucket",
+    "EMBEDDING_MODEL_ID": "amazon.titan-embed-text-v2:0",
+    "MODEL_ID": "anthropic.claude-3-haiku-20240307-v1:0",
+    "MEMORY_TABLE": "bench-memory",
+    "DOCUMENT_TABLE": "bench-documents",
+    "QUEUE": "https://sqs.us-east-1.amazonaws.com/000000000000/bench",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "bench",
+    "AWS_SECRET_ACCESS_KEY": "bench",
+    "POWERTOOLS_SERVICE_NAME": "bench",
+}
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from app import main
+from app.routes import get_handler
+get_handler(sys.argv[1])
+print(json.dumps({"wall_ms": (time.perf_counter() - start) * 1000}))
+"""
+
+LIST_CHILD = """
+import json
+from app.routes import EVENT_SOURCES, ROUTES
+names = [target for _, _, target in ROUTES] + list(EVENT_SOURCES.values())
+print(json.dumps(list(dict.fromkeys(names))))
+"""
+
+
+def run_child(args):
+    # Same environment as a Lambda container: app.utils needs its env vars
+    env = {**DUMMY_ENV, **os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=LAMBDA_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+
+def handler_names():
+    proc = run_child(["-c", LIST_CHILD])
+    if proc.returncode != 0:
+        raise RuntimeError(f"listing handlers: {proc.stderr.strip().splitlines()[-1]}")
+    return json.loads(proc.stdout)
+
+
+def parse_importtime(stderr):
+    """`-X importtime` lines -> [(module, self_us, cumulative_us)]."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        modules.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return modules
+
+
+def profile(name):
+    proc = run_child(["-X", "importtime", "-c", CHILD, name])
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name}: {proc.stderr.strip().splitlines()[-1]}")
+
+    modules = parse_importtime(proc.stderr)
+    packages = defaultdict(int)
+    for module, self_us, _ in modules:
+        packages[module.split(".")[0]] += self_us
+    return {
+        "handler": name,
+        "wall_ms": json.loads(proc.stdout.strip().splitlines()[-1])["wall_ms"],
+        "import_ms": sum(self_us for _, self_us, _ in modules) / 1000,
+        "modules": len(modules),
+        "packages": {pkg: us / 1000 for pkg, us in packages.items()},
+    }
+
+
+def render(results, top):
+    lines = [
+        "| handler | wall ms | import ms | modules | slowest packages (self ms) |",
+        "|---|---:|---:|---:|---|",
+    ]
+    for r in sorted(results, key=lambda r: r["wall_ms"]):
+        slowest = sorted(r["packages"].items(), key=lambda kv: -kv[1])[:top]
+        lines.append(
+            f"| {r['handler']} | {r['wall_ms']:.0f} | {r['import_ms']:.0f} "
+            f"| {r['modules']} | "
+            + ", ".join(f"{pkg} {ms:.0f}" for pkg, ms in slowest)
+            + " |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("handlers", nargs="*", help="default: every handler")
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        help="exit non-zero if any profiled handler's wall ms exceeds this",
+    )
+    args = parser.parse_args()
+
+    results = [profile(name) for name in args.handlers or handler_names()]
+    report = render(results, args.top)
+    print(report, end="")
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+
+    if args.budget is not None:
+        over = [r["handler"] for r in results if r["wall_ms"] > args.budget]
+        if over:
+            print(f"Over the {args.budget:.0f} ms budget: {', '.join(over)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()